@@ -9,6 +9,12 @@ import streamlit as st
 if os.path.exists('.env'):
     load_dotenv()
 
+from modules.profiler import profile_rerun, profiling_admin, render_profiles_page
+
+# Opt-in profiling: the script runs again inside the profiler, so this outer run ends here
+if profile_rerun(globals()):
+    st.stop()
+
 # Required environment variables
 REQUIRED_KEYS = [
     "MONGO_URI",
@@ -51,15 +57,23 @@ if missing_keys:
 
 from streamlit_mic_recorder import mic_recorder
 import speech_recognition as sr
-from pydub import AudioSegment
 import io
-import tempfile
 # import psycopg2
-from pymongo import MongoClient
 from modules.auth import setup_services, clear_saved_credentials, get_current_user_info, load_saved_credentials, authenticate_oauth
 from modules.file_processor import parse_topic_from_files
 from modules.quiz_generator import generate_quiz
-from modules.forms_manager import create_quiz_form, generate_fib_variants
+from modules.forms_manager import create_quiz_form, generate_fib_variants, new_publish_checkpoint
+from modules.form_pool import get_form_pool
+from modules.artifact_store import get_artifact_store, current_session_id
+from modules.quiz_history import get_database, render_history_page, source_content_hash
+from modules.results import render_results_panel
+from modules.lms_export import EXPORT_FORMAT_CHOICES, export_basename, export_filename, export_mime, export_quiz_bytes
+from modules.question_bank import assemble_from_bank, merge_generated, shortfall_prompt
+from modules.pg_backend import use_postgres
+from modules.shared_state import restore_draft_state, save_draft_state
+from modules.transcriber import get_transcriber
+from modules.speculation import SPECULATIVE_GENERATION, get_speculator, speculation_key
+from modules.text_compressor import estimate_tokens
 from insert_quiz import insert_quiz
 
 st.set_page_config("Smart Quiz Generator")
@@ -90,16 +104,56 @@ def preview_quiz(quiz):
                 st.write(", ".join(accepted_answers))
 
 
+def load_draft_file_topic(draft_inputs):
+    """Fetch the draft's extracted text from the artifact store, re-extracting if it was evicted."""
+    if not draft_inputs.get("uploads"):
+        return ""
+    artifact_store = get_artifact_store()
+    file_topic = artifact_store.get_text(draft_inputs.get("file_topic_key"))
+    if file_topic is not None:
+        return file_topic
+    stored_files = artifact_store.open_uploads(draft_inputs.get("uploads"))
+    if stored_files is None:
+        st.error("❌ The uploaded files for this draft have expired. Please upload them again and generate a new draft.")
+        st.stop()
+    return parse_topic_from_files(stored_files)
+
+
+def assemble_bank_draft(uploaded_files, session_id, user_prompt, num_mcq, num_fill, num_options, difficulty):
+    """Questions from the bank for these inputs, and how many the model still has to write."""
+    wanted = {"mcq": num_mcq, "fill": num_fill}
+    if use_postgres():
+        # The question bank lives in the MongoDB questions collection
+        return {"mcq": [], "fill": []}, wanted
+    try:
+        uploads = get_artifact_store().put_uploads(uploaded_files, session_id)
+        return assemble_from_bank(
+            get_database(secrets["MONGO_URI"]),
+            num_mcq,
+            num_fill,
+            num_options,
+            difficulty,
+            source_content_hash(uploads),
+            user_prompt
+        )
+    except Exception as e:
+        print(f"⚠️ Question bank lookup failed, generating the whole quiz: {e}")
+        return {"mcq": [], "fill": []}, wanted
+
+
 def clear_draft_state():
     for key in [
         "draft_quiz",
         "draft_inputs",
         "draft_form_link",
         "draft_ready",
-        "draft_created"
+        "draft_created",
+        "publish_checkpoint"
     ]:
         if key in st.session_state:
             del st.session_state[key]
+    # The replaced draft's uploads and text no longer need to stay cached for this session
+    get_artifact_store().release_session(current_session_id())
 
 # --- Authentication Panel ---
 st.sidebar.markdown("## 🔐 Authentication Status")
@@ -117,6 +171,11 @@ if credentials and credentials.valid:
     user_name = user_info.get('displayName', 'User')
     user_email = user_info.get('emailAddress', 'Unknown')
     st.sidebar.success(f"✅ **Authenticated as:**\n{user_name}\n{user_email}")
+    # In shared state mode, pick up a draft started on another replica
+    restore_draft_state(st.session_state, user_email)
+    form_pool = get_form_pool()
+    # Keep a few empty quiz forms ready so approving skips form creation
+    form_pool.top_up(user_email, credentials)
     if st.sidebar.button("🚪 Logout"):
         clear_saved_credentials()
         st.rerun()
@@ -130,6 +189,12 @@ else:
         if st.sidebar.button("🔑 Login with Google", type="primary"):
             authenticate_oauth()
 
+artifact_usage = get_artifact_store().memory_usage()
+st.sidebar.caption(
+    f"🗄️ Upload cache: {artifact_usage['memory_bytes'] / 1048576:.1f} / "
+    f"{artifact_usage['memory_budget_bytes'] / 1048576:.0f} MB in memory, "
+    f"{artifact_usage['disk_bytes'] / 1048576:.1f} MB on disk"
+)
 st.sidebar.markdown("---")
 
 # Main panel: show welcome if not authenticated, else show app
@@ -142,6 +207,18 @@ if not credentials or not credentials.valid:
 
 st.title("🧠 Smart Quiz Generator")
 
+views = ["Generate quiz", "My quizzes"]
+if profiling_admin():
+    views.append("Profiles")
+view = st.sidebar.radio("📂 View", views)
+if view == "Profiles":
+    render_profiles_page()
+    st.stop()
+if view == "My quizzes":
+    history_db = get_database(secrets["MONGO_URI"])
+    history_quizzes = render_history_page(history_db, user_email)
+    render_results_panel(history_db, history_quizzes, setup_services)
+    st.stop()
 
 api_key = secrets["GEMINI_API_KEY"]
 col1, col2, col3 = st.columns(3)
@@ -155,8 +232,6 @@ with col3:
 uploaded_files = st.file_uploader("Upload PDF or TXT files (multiple allowed)", type=["pdf", "txt"], accept_multiple_files=True)
 
 # --- Audio input section ---
-import whisper
-import warnings
 
 st.subheader("🎤 Speak your quiz topic")
 audio_dict = mic_recorder(start_prompt="Click to record", stop_prompt="Stop recording", key='recorder')
@@ -169,47 +244,13 @@ if audio_dict and audio_dict.get("bytes"):
     st.audio(audio_bytes, format="audio/wav")
 
     try:
-        # STEP 1: Save raw audio bytes to file (webm or wav)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{mic_format}") as temp_in:
-            temp_in.write(audio_bytes)
-            temp_in.flush()
-            input_path = temp_in.name
-
-        # STEP 2: Convert to proper WAV format for Whisper
-        # This works even without FFmpeg for basic formats
-        try:
-            audio_segment = AudioSegment.from_file(input_path, format=mic_format)
-            audio_segment = audio_segment.set_channels(1).set_frame_rate(16000)  # Mono + 16kHz is ideal
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_out:
-                audio_segment.export(temp_out, format="wav")
-                wav_path = temp_out.name
-        except Exception as e:
-            # Fallback: try to use the file directly if conversion fails
-            st.info("🔄 Using direct audio file processing...")
-            wav_path = input_path
-
-        # STEP 3: Transcribe using Whisper
-        st.info("🔍 Transcribing audio using Whisper...")
-
-        @st.cache_resource
-        def load_whisper_model():
-            import whisper
-            return whisper.load_model("base")
-
-        model = load_whisper_model()
-        result = model.transcribe(wav_path, language="en", fp16=False)
-
-        audio_text = result["text"]
+        # Transcripts are cached by audio hash, so reruns with the same clip skip Whisper entirely
+        transcriber = get_transcriber()
+        if transcriber.cached(audio_bytes) is None:
+            st.info("🔍 Transcribing audio using Whisper...")
+        audio_text = transcriber.transcribe(audio_bytes, mic_format)
         st.success(f"Whisper Transcription: {audio_text}")
 
-        # Clean up temporary files
-        try:
-            os.unlink(input_path)
-            if wav_path != input_path:
-                os.unlink(wav_path)
-        except:
-            pass  # Ignore cleanup errors
-
     except Exception as e:
         st.error(f"❌ Whisper transcription failed: {e}")
         st.info("💡 **Tip:** Try recording again or use text input instead.")
@@ -222,6 +263,11 @@ user_prompt = st.text_area(
 )
 
 difficulty = st.selectbox("Select Difficulty Level", ["Easy", "Medium", "Hard"])
+use_question_bank = st.checkbox(
+    "Reuse questions from the question bank",
+    value=False,
+    help="Fills the quiz with stored questions for the same files or topic and only generates the missing ones with AI."
+)
 
 form_title = st.text_input("Form Title", value="Generated Quiz Form")
 educator_emails_input = st.text_input(
@@ -251,30 +297,68 @@ shuffle_options = st.checkbox(
 #     st.error(f"❌ Database connection failed: {e}")
 
 try:
-    client = MongoClient(secrets["MONGO_URI"])
-    db = client.get_database()  # quizdb
+    db = get_database(secrets["MONGO_URI"])  # quizdb
     # Simple test: list collections
     db.list_collection_names()
     st.success("✅ MongoDB connection successful.")
 except Exception as e:
     st.error(f"❌ MongoDB connection failed: {e}")
 
+session_id = current_session_id()
+generation_key = None
+if SPECULATIVE_GENERATION and not use_question_bank and (uploaded_files or user_prompt):
+    # Hash the current inputs and start generating in the background once they stop changing
+    speculative_uploads = get_artifact_store().put_uploads(uploaded_files, session_id)
+    generation_key = speculation_key(
+        uploads=[upload["sha256"] for upload in speculative_uploads],
+        user_prompt=user_prompt,
+        num_mcq=num_mcq,
+        num_fill=num_fill,
+        num_options=num_options,
+        difficulty=difficulty
+    )
+
+    def prepare_speculative_topic(uploads=speculative_uploads, prompt=user_prompt):
+        stored_files = get_artifact_store().open_uploads(uploads) or []
+        topic = parse_topic_from_files(stored_files) if stored_files else ""
+        return topic, estimate_tokens(topic + prompt)
+
+    def generate_speculative_quiz(topic, prompt=user_prompt, mcq=num_mcq, fill=num_fill, level=difficulty, options=num_options):
+        return generate_quiz(topic, api_key, mcq, fill, level)(prompt, options)
+
+    get_speculator().schedule(session_id, user_email, generation_key, prepare_speculative_topic, generate_speculative_quiz)
+
 if st.button("⚡ Generate Form") and (uploaded_files or user_prompt):
 
-    file_topic = parse_topic_from_files(uploaded_files) if uploaded_files else ""
-    if not (user_prompt or file_topic):
+    speculative = get_speculator().take(session_id, generation_key) if generation_key else None
+    bank_quiz, shortfall = {"mcq": [], "fill": []}, {"mcq": num_mcq, "fill": num_fill}
+    if use_question_bank and not speculative:
+        bank_quiz, shortfall = assemble_bank_draft(uploaded_files, session_id, user_prompt, num_mcq, num_fill, num_options, difficulty)
+    needs_generation = not speculative and (shortfall["mcq"] > 0 or shortfall["fill"] > 0)
+
+    if speculative:
+        file_topic, quiz = speculative
+    else:
+        # Files only need parsing when the model has to write some of the questions
+        file_topic = parse_topic_from_files(uploaded_files) if uploaded_files and needs_generation else ""
+    if needs_generation and not (user_prompt or file_topic):
         st.error("❌ Please provide either a topic prompt or a file.")
         st.stop()
 
-    services = setup_services()
-    quiz_func = generate_quiz(file_topic, api_key, num_mcq, num_fill, difficulty)
-    quiz = quiz_func(user_prompt, num_options)
+    if needs_generation:
+        quiz_func = generate_quiz(file_topic, api_key, shortfall["mcq"], shortfall["fill"], difficulty)
+        generated = quiz_func(shortfall_prompt(user_prompt, bank_quiz), num_options)
+        quiz = merge_generated(bank_quiz, generated)
+    elif not speculative:
+        quiz = bank_quiz
 
     clear_draft_state()
 
+    # Only hashes and metadata stay in session state; bytes and text spill to the artifact store
+    artifact_store = get_artifact_store()
     st.session_state.draft_quiz = quiz
     st.session_state.draft_inputs = {
-        "uploaded_files": uploaded_files,
+        "uploads": artifact_store.put_uploads(uploaded_files, session_id),
         "user_prompt": user_prompt,
         "difficulty": difficulty,
         "form_title": form_title,
@@ -283,12 +367,14 @@ if st.button("⚡ Generate Form") and (uploaded_files or user_prompt):
         "shuffle_questions": shuffle_questions,
         "shuffle_options": shuffle_options,
         "num_options": num_options,
-        "file_topic": file_topic,
+        # No key when the bank covered the whole quiz; regenerating extracts the files then
+        "file_topic_key": artifact_store.put_text(file_topic, session_id) if file_topic or not uploaded_files else None,
         "num_mcq": num_mcq,
         "num_fill": num_fill
     }
     st.session_state.draft_ready = True
     st.session_state.draft_created = False
+    save_draft_state(st.session_state, user_email)
     st.success("✅ Draft quiz generated. Review it below and retry if needed before creating the form.")
     st.rerun()
 
@@ -299,7 +385,7 @@ if st.session_state.get("draft_ready") and st.session_state.get("draft_quiz"):
     with col_review_1:
         if st.button("🔁 Regenerate Draft"):
             draft_inputs = st.session_state.get("draft_inputs", {})
-            file_topic = draft_inputs.get("file_topic", "")
+            file_topic = load_draft_file_topic(draft_inputs)
             num_mcq = draft_inputs.get("num_mcq", num_mcq)
             num_fill = draft_inputs.get("num_fill", num_fill)
             difficulty = draft_inputs.get("difficulty", difficulty)
@@ -308,25 +394,47 @@ if st.session_state.get("draft_ready") and st.session_state.get("draft_quiz"):
 
             quiz_func = generate_quiz(file_topic, api_key, num_mcq, num_fill, difficulty)
             st.session_state.draft_quiz = quiz_func(user_prompt, num_options)
+            # A new draft publishes into a fresh (pooled) form, not the one started for the old draft
+            st.session_state.pop("publish_checkpoint", None)
+            st.session_state.pop("draft_form_link", None)
+            st.session_state.draft_created = False
+            save_draft_state(st.session_state, user_email)
             st.success("✅ New draft generated.")
             st.rerun()
 
     with col_review_2:
-        if st.button("✅ Approve & Create Form"):
+        # Hidden once published, so a second click cannot store the quiz twice
+        if not st.session_state.get("draft_created") and st.button("✅ Approve & Create Form"):
             draft_inputs = st.session_state.get("draft_inputs", {})
             services = setup_services()
-            form_link = create_quiz_form(
-                services["forms"],
-                services["drive"],
-                st.session_state.draft_quiz,
-                draft_inputs.get("educator_emails", educator_emails),
-                draft_inputs.get("form_title", form_title),
-                release_scores_immediately=draft_inputs.get("release_scores_immediately", release_scores_immediately),
-                shuffle_questions=draft_inputs.get("shuffle_questions", shuffle_questions),
-                shuffle_options=draft_inputs.get("shuffle_options", shuffle_options)
-            )
-
-            files_uploaded = ",".join([f.name for f in draft_inputs.get("uploaded_files", uploaded_files) or []])
+            # Kept in session state so a failed publish resumes on retry instead of creating another form
+            if "publish_checkpoint" not in st.session_state:
+                st.session_state.publish_checkpoint = new_publish_checkpoint(
+                    st.session_state.draft_quiz,
+                    draft_inputs.get("form_title", form_title)
+                )
+            prepared_form_id = None
+            if not st.session_state.publish_checkpoint.get("form_id"):
+                prepared_form_id = form_pool.acquire(user_email)
+            try:
+                form_link = create_quiz_form(
+                    services["forms"],
+                    services["drive"],
+                    st.session_state.draft_quiz,
+                    draft_inputs.get("educator_emails", educator_emails),
+                    draft_inputs.get("form_title", form_title),
+                    release_scores_immediately=draft_inputs.get("release_scores_immediately", release_scores_immediately),
+                    shuffle_questions=draft_inputs.get("shuffle_questions", shuffle_questions),
+                    shuffle_options=draft_inputs.get("shuffle_options", shuffle_options),
+                    checkpoint=st.session_state.publish_checkpoint,
+                    prepared_form_id=prepared_form_id
+                )
+            finally:
+                # Share checkpoint progress so a retry on another replica resumes it too
+                save_draft_state(st.session_state, user_email)
+            form_pool.top_up(user_email, credentials)
+
+            files_uploaded = ",".join([upload["name"] for upload in draft_inputs.get("uploads", [])])
             editor_emails_str = ",".join(draft_inputs.get("educator_emails", educator_emails))
 
             insert_quiz(
@@ -340,15 +448,35 @@ if st.session_state.get("draft_ready") and st.session_state.get("draft_quiz"):
                 st.session_state.draft_quiz,
                 draft_inputs.get("release_scores_immediately", release_scores_immediately),
                 draft_inputs.get("shuffle_questions", shuffle_questions),
-                draft_inputs.get("shuffle_options", shuffle_options)
+                draft_inputs.get("shuffle_options", shuffle_options),
+                created_by=user_email,
+                source_hash=source_content_hash(draft_inputs.get("uploads")),
+                sources=draft_inputs.get("uploads", [])
             )
 
             st.session_state.draft_form_link = form_link
             st.session_state.draft_created = True
+            # Published; the next draft starts from a new checkpoint and can take a pooled form
+            st.session_state.pop("publish_checkpoint", None)
             st.session_state.notification_sent = False
+            save_draft_state(st.session_state, user_email)
             st.success(f"Form created: {form_link}")
             st.rerun()
 
+    # Offline alternative to publishing through Google Forms
+    draft_title = st.session_state.get("draft_inputs", {}).get("form_title", form_title)
+    col_export_1, col_export_2 = st.columns(2)
+    with col_export_1:
+        export_label = st.selectbox("Export draft as", list(EXPORT_FORMAT_CHOICES))
+        export_format = EXPORT_FORMAT_CHOICES[export_label]
+    with col_export_2:
+        st.download_button(
+            f"⬇️ Download {export_label}",
+            export_quiz_bytes(draft_title, st.session_state.draft_quiz, export_format),
+            file_name=export_filename(export_basename(draft_title), export_format),
+            mime=export_mime(export_format)
+        )
+
 if st.session_state.get("draft_created") and st.session_state.get("draft_form_link"):
     st.success(f"Form created: {st.session_state.draft_form_link}")
 
@@ -369,6 +497,7 @@ if st.session_state.get("draft_created") and st.session_state.get("draft_form_li
             draft_emails = ",".join(st.session_state.get("draft_inputs", {}).get("educator_emails", educator_emails))
             send_email(subject, body, draft_emails, secrets["EMAIL"], secrets["EMAIL_PASSWORD"])
             st.session_state.notification_sent = True
+            save_draft_state(st.session_state, user_email)
             st.info("Notification email sent to educators.")
         except Exception:
             st.warning("No Educators email provided")
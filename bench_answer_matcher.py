@@ -0,0 +1,75 @@
+import random
+import sys
+import time
+from modules.answer_matcher import AnswerMatcher
+from modules.forms_manager import generate_fib_variants
+from modules.results import answer_matrix
+
+EXPECTED = ["Photosynthesis", "carbon dioxide", "1,000", "Isaac Newton", "three", "H2O", "mitochondria", "3.14"]
+SYNONYMS = {"carbon dioxide": ["CO2"], "H2O": ["water"]}
+# (expected, response, accepted): symbols and numbers must not be merged away
+EDGE_CASES = [
+    ("1/2", "12", False), ("1/2", "1 / 2", True), ("C++", "C", False), ("C++", "c++", True),
+    ("C#", "C", False), ("9.8 m/s", "9.8 ms", False), ("9.8 m/s", "9.8 m / s", True),
+    ("x = 5", "x5", False), ("x = 5", "x=5", True), ("12", "1 2", False), ("50%", "50", False),
+    ("3+4", "34", False), ("carbon dioxide", "carbondioxide", True), ("1,000", "1000", True)
+]
+
+
+def make_answers(count, seed=7):
+    """Student-style variations of the expected answers: case, spacing, punctuation, numbers."""
+    rng = random.Random(seed)
+    noise = [
+        lambda a: a, str.upper, str.lower, str.title,
+        lambda a: f"  {a} ", lambda a: f"{a}.", lambda a: a.replace(" ", "  "),
+        lambda a: a.replace(",", ""), lambda a: f"the {a}", lambda a: a + "s",
+        lambda a: "3" if a == "three" else a, lambda a: "CO2" if a == "carbon dioxide" else a
+    ]
+    expected = [EXPECTED[i % len(EXPECTED)] for i in range(count)]
+    return expected, [rng.choice(noise)(answer) for answer in expected]
+
+
+def main():
+    """Time 100k FIB comparisons: old variant lists vs the canonical matcher (python bench_answer_matcher.py [n])."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    expected, answers = make_answers(count)
+
+    started = time.perf_counter()
+    variants = {answer: set(generate_fib_variants(answer)) for answer in EXPECTED}
+    old_correct = sum(answer.strip() in variants[exp] for answer, exp in zip(answers, expected))
+    old_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matcher = AnswerMatcher(SYNONYMS)
+    keys = {answer: matcher.compile_key(answer) for answer in EXPECTED}
+    new_correct = sum(matcher.matches(keys[exp], answer) for answer, exp in zip(answers, expected))
+    new_seconds = time.perf_counter() - started
+
+    # Bulk path used by regrade_form: one column per expected answer
+    answer_key = [{"question_id": f"q{i}", "kind": "fill", "correct": [exp], "points": 1} for i, exp in enumerate(EXPECTED)]
+    per_student = count // len(EXPECTED)
+    responses = [
+        {"answers": {f"q{i}": {"textAnswers": {"answers": [{"value": answers[s * len(EXPECTED) + i]}]}} for i in range(len(EXPECTED))}}
+        for s in range(per_student)
+    ]
+    started = time.perf_counter()
+    matrix = answer_matrix(answer_key, responses, AnswerMatcher(SYNONYMS))
+    bulk_seconds = time.perf_counter() - started
+
+    print(f"answers:               {count}")
+    print(f"variant lists:         {old_seconds * 1000:8.1f} ms, {old_correct} accepted")
+    print(f"canonical matcher:     {new_seconds * 1000:8.1f} ms, {new_correct} accepted")
+    print(f"bulk regrade matrix:   {bulk_seconds * 1000:8.1f} ms for {matrix.size} answers")
+
+    wrong = [
+        (exp, answer) for exp, answer, accepted in EDGE_CASES
+        if matcher.matches(matcher.compile_key(exp), answer) != accepted
+    ]
+    print(f"edge cases:            {len(EDGE_CASES) - len(wrong)}/{len(EDGE_CASES)} graded as expected")
+    for exp, answer in wrong:
+        print(f"  wrong grade: expected {exp!r}, answered {answer!r}")
+    if wrong:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import argparse
+import os
+from dotenv import load_dotenv
+load_dotenv()
+from modules.lms_export import EXPORT_FORMATS, export_to_file
+from modules.pg_backend import use_postgres
+from modules.quiz_history import iter_user_quizzes
+
+
+def main():
+    """Stream quizzes from the history into a Moodle XML, GIFT, QTI 2.1 or CSV file."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("format", choices=sorted(EXPORT_FORMATS))
+    parser.add_argument("output", help="File to write; QTI is always a zip package")
+    parser.add_argument("--user", help="Only export quizzes created by this email address")
+    parser.add_argument("--zip", action="store_true", help="Compress single-file formats into a zip")
+    args = parser.parse_args()
+
+    db = None
+    if not use_postgres():
+        from pymongo import MongoClient
+        db = MongoClient(os.environ["MONGO_URI"]).get_database()
+    counts = export_to_file(iter_user_quizzes(db, args.user), args.output, args.format, args.zip)
+    print(f"Exported {counts['quizzes']} quiz(zes) with {counts['questions']} question(s) to {args.output}.")
+    if counts["skipped"]:
+        print(f"⚠️ Skipped {counts['skipped']} question(s) whose answer matches no option.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import uuid
+from collections import defaultdict
+from unittest import mock
+
+import numpy as np
+
+# Dummy values for the settings app.py requires; nothing reaches a real service
+for key in ["MONGO_URI", "GEMINI_API_KEY", "EMAIL", "EMAIL_PASSWORD"]:
+    os.environ.setdefault(key, f"load-test-{key.lower()}")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+
+from modules.artifact_store import StoredUpload
+from modules.write_buffer import get_write_buffer
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+FAKE_QUIZ = {
+    "mcq": [
+        {
+            "question": f"Which statement about topic {i} is correct?",
+            "options": [f"Option {i}.{j}" for j in range(4)],
+            "answer": f"Option {i}.0"
+        }
+        for i in range(5)
+    ],
+    "fill": [
+        {"question": f"Topic {i} is also called ____.", "answer": f"answer {i}"}
+        for i in range(2)
+    ]
+}
+
+
+def make_fixture_pdf(lines):
+    """Minimal single-page PDF with one text line per entry, readable by PyPDF2."""
+    stream = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    pdf = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n"
+    xref_offset = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    return pdf.encode("latin-1")
+
+
+def load_fixtures(paths):
+    """(name, bytes) pairs for the given files, or two generated PDFs."""
+    if paths:
+        fixtures = []
+        for path in paths:
+            with open(path, "rb") as f:
+                fixtures.append((os.path.basename(path), f.read()))
+        return fixtures
+    return [
+        (f"fixture_{n}.pdf", make_fixture_pdf([f"Chapter {n} section {i}: photosynthesis converts light into chemical energy." for i in range(40)]))
+        for n in range(2)
+    ]
+
+
+class FakeCredentials:
+    valid = True
+    expired = False
+    refresh_token = None
+    token = "load-test-token"
+
+
+class FakeRequest:
+    def __init__(self, result, latency):
+        self.result = result
+        self.latency = latency
+
+    def execute(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.result
+
+
+class FakeFormsService:
+    """Answers the Forms API calls made by create_quiz_form."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def forms(self):
+        return self
+
+    def create(self, body):
+        return FakeRequest({"formId": uuid.uuid4().hex}, self.latency)
+
+    def batchUpdate(self, formId, body):
+        replies = [
+            {"createItem": {"itemId": uuid.uuid4().hex[:8]}} if "createItem" in request else {}
+            for request in body.get("requests", [])
+        ]
+        return FakeRequest({"replies": replies}, self.latency)
+
+
+class FakeDriveService:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def files(self):
+        return self
+
+    def permissions(self):
+        return self
+
+    def update(self, **kwargs):
+        return FakeRequest({}, self.latency)
+
+    def create(self, **kwargs):
+        return FakeRequest({}, self.latency)
+
+
+class FakeDatabase:
+    def list_collection_names(self):
+        return []
+
+
+class FakeSMTP:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def login(self, *args):
+        pass
+
+    def sendmail(self, *args):
+        pass
+
+
+def fake_user_info(credentials):
+    import streamlit as st
+    user = st.session_state.get("load_test_user", "teacher@example.com")
+    return {"displayName": user.split("@")[0], "emailAddress": user}
+
+
+def fake_rerun():
+    # AppTest replays a clicked button on st.rerun(), which would generate forever.
+    # End the run instead and let run_session issue the follow-up rerun itself.
+    import streamlit as st
+    st.session_state["load_test_rerun"] = True
+    st.stop()
+
+
+def fake_chat_model_factory(latency):
+    def reply(prompt_value):
+        if latency:
+            time.sleep(latency)
+        return AIMessage(content=json.dumps(FAKE_QUIZ))
+
+    def build_chat_model(model, api_key, timeout=None):
+        return RunnableLambda(reply)
+    return build_chat_model
+
+
+def shared_runtime():
+    """
+    One mock runtime for all sessions. Each AppTest run installs its own and
+    clears it when done, which breaks the other sessions running in parallel.
+    """
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    return [
+        mock.patch.object(Runtime, "instance", classmethod(lambda cls: runtime)),
+        mock.patch.object(Runtime, "exists", classmethod(lambda cls: True))
+    ]
+
+
+def install_fakes(fixtures, llm_latency, api_latency, saved_records):
+    """Patch every external dependency of app.py. Returns the started patchers."""
+    def file_uploader(*args, **kwargs):
+        return [StoredUpload(name, data) for name, data in fixtures]
+
+    patchers = [
+        mock.patch("modules.auth.load_saved_credentials", lambda: FakeCredentials()),
+        mock.patch("modules.auth.get_current_user_info", fake_user_info),
+        mock.patch("modules.auth.setup_services", lambda: {
+            "forms": FakeFormsService(api_latency),
+            "drive": FakeDriveService(api_latency)
+        }),
+        mock.patch("modules.quiz_history.get_database", lambda mongo_uri: FakeDatabase()),
+        mock.patch("modules.quiz_generator.build_chat_model", fake_chat_model_factory(llm_latency)),
+        mock.patch("streamlit.file_uploader", file_uploader),
+        mock.patch("streamlit.rerun", fake_rerun),
+        mock.patch("streamlit_mic_recorder.mic_recorder", lambda **kwargs: None),
+        mock.patch("smtplib.SMTP_SSL", FakeSMTP),
+        *shared_runtime()
+    ]
+    for patcher in patchers:
+        patcher.start()
+    # Prime the process-wide write buffer with a writer that only counts records
+    get_write_buffer(writer_factory=lambda: lambda docs: saved_records.append(len(docs)))
+    return patchers
+
+
+def click(app, label):
+    return next(button for button in app.button if button.label == label).click()
+
+
+def run_session(user, timeout, latencies, errors):
+    """One teacher: open the app, generate a draft from the fixtures, approve it."""
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    app.session_state["load_test_user"] = user
+    app.session_state["load_test_rerun"] = False
+    steps = [
+        ("load", lambda: app),
+        ("generate", lambda: click(app, "⚡ Generate Form")),
+        ("approve", lambda: click(app, "✅ Approve & Create Form"))
+    ]
+    for step, prepare in steps:
+        try:
+            started = time.perf_counter()
+            prepare().run()
+            latencies[step].append(time.perf_counter() - started)
+            if app.exception:
+                raise RuntimeError(app.exception[0].value)
+            if app.session_state["load_test_rerun"]:
+                app.session_state["load_test_rerun"] = False
+                started = time.perf_counter()
+                app.run()
+                latencies["rerun"].append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(f"{user} {step}: {e}")
+            return
+    if not any("Form created" in str(message.value) for message in app.success):
+        errors.append(f"{user}: no form link after approving")
+
+
+def rss_bytes():
+    """Current resident set size, from /proc where available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_level(concurrency, rounds, timeout):
+    latencies = defaultdict(list)
+    errors = []
+    lock = threading.Lock()
+
+    def worker(index):
+        for round_number in range(rounds):
+            session_latencies = defaultdict(list)
+            session_errors = []
+            run_session(f"teacher{index}.{round_number}@example.com", timeout, session_latencies, session_errors)
+            with lock:
+                for step, values in session_latencies.items():
+                    latencies[step].extend(values)
+                errors.extend(session_errors)
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"load-session-{i}") for i in range(concurrency)]
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    return latencies, errors, wall, cpu
+
+
+def percentiles(values):
+    if not values:
+        return "-"
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return f"{p50:7.0f} {p95:7.0f} {p99:7.0f}"
+
+
+def main():
+    """Simulate concurrent teachers against app.py with fake Google, LLM and database services."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--sessions", default="1,2,4,8", help="Comma separated concurrency levels to run")
+    parser.add_argument("--rounds", type=int, default=1, help="Sessions each simulated teacher runs per level")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds the fake LLM takes per call")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Seconds each fake Google API call takes")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per rerun")
+    parser.add_argument("--pdf", nargs="*", help="Fixture files to upload, defaults to generated PDFs")
+    args = parser.parse_args()
+
+    # Reading AppTest session state from the session threads is expected here
+    logging.getLogger("streamlit.runtime.scriptrunner.script_run_context").setLevel(logging.ERROR)
+    saved_records = []
+    fixtures = load_fixtures(args.pdf)
+    patchers = install_fakes(fixtures, args.llm_latency, args.api_latency, saved_records)
+    try:
+        print(f"{'sessions':>8} {'step':>9} {'reruns':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'CPU %':>6} {'RSS MB':>7} errors")
+        for concurrency in [int(level) for level in args.sessions.split(",") if level.strip()]:
+            latencies, errors, wall, cpu = run_level(concurrency, args.rounds, args.timeout)
+            cpu_percent = 100 * cpu / wall if wall else 0
+            rss_mb = rss_bytes() / 1048576
+            all_latencies = [value for values in latencies.values() for value in values]
+            for step in ["load", "generate", "approve", "rerun", "all"]:
+                values = all_latencies if step == "all" else latencies[step]
+                print(
+                    f"{concurrency:>8} {step:>9} {len(values):>6} {percentiles(values)} "
+                    f"{cpu_percent:>6.0f} {rss_mb:>7.0f} {len(errors) if step == 'all' else ''}"
+                )
+            for error in errors[:5]:
+                print(f"   ⚠️ {error}")
+        get_write_buffer().flush()
+        print(f"quiz records written: {sum(saved_records)}")
+    finally:
+        for patcher in patchers:
+            patcher.stop()
+
+
+if __name__ == '__main__':
+    main()
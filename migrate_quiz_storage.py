@@ -0,0 +1,23 @@
+import os
+import sys
+from pymongo import MongoClient
+from dotenv import load_dotenv
+from modules.question_bank import backfill_index
+from modules.quiz_storage import migrate_quizzes
+load_dotenv()
+
+
+def main():
+    """Move existing quiz documents to the compact, question-deduplicated layout and index the question bank."""
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    client = MongoClient(os.environ["MONGO_URI"])
+    db = client.get_database()
+    migrated = migrate_quizzes(db, batch_size=batch_size)
+    print(f"Migrated {migrated} quiz document(s).")
+    scanned = backfill_index(db, batch_size=batch_size)
+    print(f"Indexed questions of {scanned} quiz document(s) for the question bank.")
+    print(f"Questions stored: {db.questions.estimated_document_count()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import re
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+# One pass tokenizer: numbers (with thousands separators and decimals), words, or
+# symbols that change an answer's meaning ('1/2', 'C++', '50%', 'x = 5', 'C#').
+# A sign only belongs to a number when it does not follow a word or digit ('3+4').
+# Everything else (other punctuation, extra whitespace) is dropped.
+TOKEN_RE = re.compile(r"(?:(?<![\w.])[-+])?(?:(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|\.\d+)|\w+|[/+%=#]")
+NUMBER_RE = re.compile(r"[-+]?[\d,]*\.?\d+")
+
+NUMBER_WORDS = {
+    word: str(value) for value, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve thirteen "
+        "fourteen fifteen sixteen seventeen eighteen nineteen twenty".split()
+    )
+}
+NUMBER_WORDS.update({"thirty": "30", "forty": "40", "fifty": "50", "sixty": "60", "seventy": "70", "eighty": "80", "ninety": "90", "hundred": "100"})
+ARTICLES = frozenset({"a", "an", "the"})
+
+
+def canonical_number(token):
+    """'1,000.50' -> '1000.5', '+3.0' -> '3', '-0' -> '0'."""
+    try:
+        value = Decimal(token.replace(",", ""))
+    except InvalidOperation:
+        return token
+    if value == 0:
+        return "0"
+    text = format(value.normalize(), "f")
+    return text[1:] if text.startswith("+") else text
+
+
+class AnswerMatcher:
+    """
+    Canonicalizing matcher for fill-in-the-blank answers.
+
+    Both the expected answers and student responses are reduced once to a
+    canonical form (Unicode NFKC, casefold, punctuation and whitespace
+    collapsed, numbers and number words canonicalized, synonyms resolved).
+    Grading is then a set lookup instead of comparing against a fixed list
+    of spelling variants.
+
+    Args:
+        synonyms (dict): Optional mapping of an answer to equivalent answers,
+            e.g. {"CO2": ["carbon dioxide"]}
+        ignore_articles (bool): Drop 'a', 'an' and 'the'
+    """
+
+    def __init__(self, synonyms=None, ignore_articles=False):
+        self.ignore_articles = ignore_articles
+        self._cache = {}
+        self._synonyms = {}
+        for answer, equivalents in (synonyms or {}).items():
+            representative = self.canonicalize(answer)
+            for equivalent in equivalents:
+                self._synonyms[self.canonicalize(equivalent)] = representative
+
+    def canonicalize(self, text):
+        text = "" if text is None else str(text)
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+        tokens = []
+        for token in TOKEN_RE.findall(unicodedata.normalize("NFKC", text).casefold()):
+            if NUMBER_RE.fullmatch(token):
+                token = canonical_number(token)
+            else:
+                token = NUMBER_WORDS.get(token, token)
+                if self.ignore_articles and token in ARTICLES:
+                    continue
+            tokens.append(token)
+        canonical = " ".join(tokens)
+        if len(self._cache) < 1_000_000:
+            self._cache[text] = canonical
+        return canonical
+
+    def _resolve(self, canonical):
+        return self._synonyms.get(canonical, canonical)
+
+    @staticmethod
+    def _squeezed(canonical):
+        """
+        The canonical form without spaces, or None when it has a number token.
+
+        Spacing differences ('carbon dioxide' / 'carbondioxide') are accepted,
+        but joining numbers would turn '1 2' into '12'.
+        """
+        tokens = canonical.split(" ")
+        if any(NUMBER_RE.fullmatch(token) for token in tokens):
+            return None
+        return "".join(tokens)
+
+    def compile_key(self, expected_answers):
+        """Precompute the set of canonical forms accepted for a question."""
+        if isinstance(expected_answers, str):
+            expected_answers = [expected_answers]
+        key = set()
+        for answer in expected_answers:
+            canonical = self._resolve(self.canonicalize(answer))
+            if canonical:
+                key.add(canonical)
+                # Spacing differences were accepted by the old variant list as well
+                squeezed = self._squeezed(canonical)
+                if squeezed:
+                    key.add(squeezed)
+        return frozenset(key)
+
+    def matches(self, key, response):
+        canonical = self._resolve(self.canonicalize(response))
+        if not canonical:
+            return False
+        if canonical in key:
+            return True
+        squeezed = self._squeezed(canonical)
+        return squeezed is not None and squeezed in key
@@ -0,0 +1,275 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from modules.shared_state import SHARED_ARTIFACT_MAX_BYTES, SHARED_ARTIFACT_TTL_SECONDS, get_shared_state
+
+# Global budget for artifact bytes held in process memory, shared by all sessions
+ARTIFACT_MEMORY_BUDGET_MB = float(os.environ.get("ARTIFACT_MEMORY_BUDGET_MB", "64"))
+# Budget for the disk spill directory; least recently used artifacts are deleted beyond it
+ARTIFACT_DISK_BUDGET_MB = float(os.environ.get("ARTIFACT_DISK_BUDGET_MB", "2048"))
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "quiz_artifacts"))
+# A session's claim on its artifacts lapses after this long without it storing them again
+ARTIFACT_SESSION_TTL_SECONDS = float(os.environ.get("ARTIFACT_SESSION_TTL_SECONDS", "21600"))
+
+
+class StoredUpload(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile rebuilt from the store."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for uploads and extracted text.
+
+    Session state only keeps the sha256 keys returned here. Every artifact is
+    written through to disk; a bounded, process-wide LRU keeps the hot ones
+    in memory, so memory use stays flat no matter how many sessions upload
+    large files. With a shared state backend, artifacts are also written
+    there and fetched from it on a local miss, so a draft started on one
+    replica can be finished on another.
+    """
+
+    def __init__(self, directory, memory_budget_bytes, disk_budget_bytes, shared_state=None, session_ttl=ARTIFACT_SESSION_TTL_SECONDS):
+        self.directory = directory
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        # key -> {session_id: monotonic time the session last stored it}
+        self._owners = {}
+        self.session_ttl = session_ttl
+        self._next_owner_sweep = time.monotonic() + session_ttl
+        self._lock = threading.Lock()
+        self.shared_state = shared_state
+        # Artifacts known to be in the shared backend, with when they were last written there
+        self._shared_keys = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if len(name) == 64 and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def put(self, data, session_id=None):
+        """Store bytes and return their content key."""
+        key = hashlib.sha256(data).hexdigest()
+        self._share(key, data)
+        with self._lock:
+            on_disk = key in self._disk
+        if not on_disk:
+            # Written outside the lock so one slow write does not hold up other sessions
+            temp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        with self._lock:
+            if key not in self._disk:
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+            self._disk.move_to_end(key)
+            if session_id:
+                self._owners.setdefault(key, {})[session_id] = time.monotonic()
+            self._remember(key, data)
+            self._expire_owners()
+            evicted = self._evict_disk()
+        self._remove_files(evicted)
+        return key
+
+    def put_text(self, text, session_id=None):
+        return self.put(text.encode("utf-8"), session_id)
+
+    def get(self, key):
+        """Return the bytes for a key, or None if the artifact was evicted."""
+        if not key:
+            return None
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            on_disk = key in self._disk
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # Evicted between the index lookup and the read
+                data = None
+            with self._lock:
+                if data is None:
+                    size = self._disk.pop(key, None)
+                    if size is not None:
+                        self._disk_bytes -= size
+                elif key in self._disk:
+                    self._disk.move_to_end(key)
+                    self._remember(key, data)
+            if data is not None:
+                return data
+        data = self._fetch_shared(key)
+        if data is not None:
+            self.put(data)
+        return data
+
+    def _share(self, key, data):
+        if self.shared_state is None or len(data) > SHARED_ARTIFACT_MAX_BYTES:
+            return
+        # Rewrite well before the shared copy expires, but not on every rerun
+        shared_at = self._shared_keys.get(key)
+        if shared_at is not None and time.monotonic() - shared_at < SHARED_ARTIFACT_TTL_SECONDS / 2:
+            return
+        try:
+            self.shared_state.set(f"artifact:{key}", data, SHARED_ARTIFACT_TTL_SECONDS)
+            self._shared_keys[key] = time.monotonic()
+        except Exception as e:
+            print(f"⚠️ Could not copy artifact to shared state: {e}")
+
+    def _fetch_shared(self, key):
+        if self.shared_state is None:
+            return None
+        try:
+            data = self.shared_state.get(f"artifact:{key}")
+        except Exception as e:
+            print(f"⚠️ Could not read artifact from shared state: {e}")
+            return None
+        if data is None or hashlib.sha256(data).hexdigest() != key:
+            return None
+        self._shared_keys[key] = time.monotonic()
+        return data
+
+    def get_text(self, key):
+        data = self.get(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def put_uploads(self, files, session_id=None):
+        """Spill uploaded files to the store and return their metadata only."""
+        uploads = []
+        for file in files or []:
+            file.seek(0)
+            data = file.read()
+            file.seek(0)
+            uploads.append({
+                "name": file.name,
+                "size": len(data),
+                "sha256": self.put(data, session_id)
+            })
+        return uploads
+
+    def open_uploads(self, uploads):
+        """Rebuild file-like uploads from metadata, or None if any was evicted."""
+        files = []
+        for upload in uploads or []:
+            data = self.get(upload.get("sha256"))
+            if data is None:
+                return None
+            files.append(StoredUpload(upload["name"], data))
+        return files
+
+    def release_session(self, session_id):
+        """Drop a session's claim on its artifacts so they are evicted first."""
+        with self._lock:
+            for key in list(self._owners):
+                self._owners[key].pop(session_id, None)
+                self._drop_unowned(key)
+
+    def _drop_unowned(self, key):
+        if not self._owners[key]:
+            del self._owners[key]
+            if key in self._memory:
+                self._memory.move_to_end(key, last=False)
+
+    def _expire_owners(self):
+        # Sessions that ended never release their claims; let them lapse instead
+        now = time.monotonic()
+        if now < self._next_owner_sweep:
+            return
+        self._next_owner_sweep = now + min(self.session_ttl, 600)
+        for key in list(self._owners):
+            owners = self._owners[key]
+            for session_id, seen in list(owners.items()):
+                if now - seen > self.session_ttl:
+                    del owners[session_id]
+            self._drop_unowned(key)
+
+    def memory_usage(self):
+        """Gauge of current memory and disk use against their budgets."""
+        with self._lock:
+            return {
+                "memory_bytes": self._memory_bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "disk_budget_bytes": self.disk_budget_bytes,
+                "disk_items": len(self._disk),
+                "sessions": len({owner for owners in self._owners.values() for owner in owners})
+            }
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_budget_bytes:
+            return
+        if key not in self._memory:
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+        self._memory.move_to_end(key)
+        while self._memory_bytes > self.memory_budget_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        """Drop least recently used artifacts from the disk index; returns the keys whose files to delete."""
+        evicted = []
+        for key in list(self._disk):
+            if self._disk_bytes <= self.disk_budget_bytes:
+                break
+            if key in self._memory:
+                continue
+            size = self._disk.pop(key)
+            self._disk_bytes -= size
+            self._owners.pop(key, None)
+            self._shared_keys.pop(key, None)
+            evicted.append(key)
+        return evicted
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+@st.cache_resource
+def get_artifact_store():
+    """Process-wide artifact store configured from the ARTIFACT_* settings."""
+    return ArtifactStore(
+        ARTIFACT_DIR,
+        int(ARTIFACT_MEMORY_BUDGET_MB * 1024 * 1024),
+        int(ARTIFACT_DISK_BUDGET_MB * 1024 * 1024),
+        get_shared_state()
+    )
+
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
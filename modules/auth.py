@@ -1,20 +1,25 @@
 
 # Robust Google OAuth for Streamlit web app
+import json
 import os
-import pickle
 import streamlit as st
 import tempfile
 import time
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from modules.google_transport import get_services
+from modules.shared_state import get_shared_state
 
 SCOPES = [
     'https://www.googleapis.com/auth/forms.body',
-    'https://www.googleapis.com/auth/drive.file'
+    'https://www.googleapis.com/auth/drive.file',
+    'https://www.googleapis.com/auth/forms.responses.readonly'
 ]
 
-TOKEN_PATH = os.path.abspath('google_oauth_token.pickle')
+TOKEN_PATH = os.path.abspath('google_oauth_token.json')
+# Key of the token in the shared state backend, used instead of TOKEN_PATH when one is configured
+TOKEN_KEY = 'google_oauth_token'
 
 def get_redirect_uri():
     """Resolve OAuth redirect URI from secrets/env, or default to local Streamlit URL."""
@@ -48,29 +53,56 @@ def get_credentials_path():
     local_path = os.path.abspath(local_path)
     return local_path
 
-def load_saved_credentials():
+def _read_token():
+    shared_state = get_shared_state()
+    if shared_state is not None:
+        return shared_state.get(TOKEN_KEY)
     if os.path.exists(TOKEN_PATH):
         with open(TOKEN_PATH, 'rb') as token:
-            creds = pickle.load(token)
+            return token.read()
+    return None
+
+def _write_token(data):
+    shared_state = get_shared_state()
+    if shared_state is not None:
+        shared_state.set(TOKEN_KEY, data)
+        return
+    with open(TOKEN_PATH, 'wb') as token:
+        token.write(data)
+
+def _delete_token():
+    shared_state = get_shared_state()
+    if shared_state is not None:
+        shared_state.delete(TOKEN_KEY)
+    elif os.path.exists(TOKEN_PATH):
+        os.remove(TOKEN_PATH)
+
+def load_saved_credentials():
+    data = _read_token()
+    if data:
+        try:
+            # Stored as authorized-user JSON, never pickled, so the store cannot inject code
+            creds = Credentials.from_authorized_user_info(json.loads(data), SCOPES)
+        except (ValueError, TypeError):
+            _delete_token()
+            return None
         if creds and creds.valid:
             return creds
         if creds and creds.expired and creds.refresh_token:
             try:
                 creds.refresh(Request())
-                with open(TOKEN_PATH, 'wb') as token:
-                    pickle.dump(creds, token)
+                save_credentials(creds)
                 return creds
             except Exception:
-                os.remove(TOKEN_PATH)
+                _delete_token()
     return None
 
 def save_credentials(creds):
-    with open(TOKEN_PATH, 'wb') as token:
-        pickle.dump(creds, token)
+    _write_token(creds.to_json().encode('utf-8'))
 
 def clear_saved_credentials():
-    if os.path.exists(TOKEN_PATH):
-        os.remove(TOKEN_PATH)
+    if _read_token():
+        _delete_token()
         st.success("✅ Logged out successfully!")
 
 def authenticate_oauth():
@@ -121,15 +153,12 @@ def setup_services():
         st.warning("🔐 Please log in with Google to use the app.")
         st.stop()
     
-    return {
-        "forms": build("forms", "v1", credentials=creds),
-        "drive": build("drive", "v3", credentials=creds)
-    }
+    return get_services(creds)
 
 def get_current_user_info(credentials):
     """Get current user info from Google Drive API"""
     try:
-        drive_service = build("drive", "v3", credentials=credentials)
+        drive_service = get_services(credentials)["drive"]
         about = drive_service.about().get(fields="user").execute()
         return about.get('user', {})
     except Exception:
@@ -1,13 +1,17 @@
 import streamlit as st
 import PyPDF2
 
+from modules.text_compressor import compress_topic, normalize_whitespace, strip_repeated_lines
 
-def parse_topic_from_files(files):
+
+def parse_topic_from_files(files, token_budget=None):
     """
     Extract text content from uploaded PDF or TXT files.
     
     Args:
         files: List of uploaded files from Streamlit file_uploader
+        token_budget (int): Token budget the combined text is compressed to,
+            defaults to PROMPT_TOKEN_BUDGET
         
     Returns:
         str: Combined text content from all files
@@ -27,7 +31,7 @@ def parse_topic_from_files(files):
         if file_name.endswith(".txt"):
             try:
                 file_content = file.read().decode("utf-8", errors="ignore")
-                text = file_content.strip()
+                text = normalize_whitespace(file_content)
             except Exception as e:
                 st.warning(f"Failed to read text file {file_name}: {e}")
             finally:
@@ -36,12 +40,10 @@ def parse_topic_from_files(files):
         elif file_name.endswith(".pdf"):
             try:
                 reader = PyPDF2.PdfReader(file)
-                pdf_text = ""
-                for page in reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        pdf_text += page_text + "\n"
-                text = pdf_text.strip()
+                pages = [page.extract_text() or "" for page in reader.pages]
+                # Running headers, footers and page numbers only waste prompt tokens
+                pdf_text = "\n".join(page for page in strip_repeated_lines(pages) if page.strip())
+                text = normalize_whitespace(pdf_text)
             except Exception as e:
                 st.warning(f"Failed to read PDF file {file_name}: {e}")
             finally:
@@ -70,7 +72,7 @@ def parse_topic_from_files(files):
         for i, topic in enumerate(all_topics, 1):
             balanced_content.append(f"\n[SECTION {i} OF {total_files}]\n{topic}")
         
-        return "\n\n".join(balanced_content).strip()
+        return compress_topic("\n\n".join(balanced_content).strip(), token_budget)
     
     # Single file case
-    return "\n\n".join(all_topics).strip()
+    return compress_topic("\n\n".join(all_topics).strip(), token_budget)
@@ -0,0 +1,154 @@
+import atexit
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from modules.google_transport import get_services
+
+# Number of empty quiz forms kept ready per user. 0 disables the pool.
+FORM_POOL_SIZE = int(os.environ.get("FORM_POOL_SIZE", "0"))
+# Optional Drive id of a master quiz form to copy instead of building one from scratch
+FORM_TEMPLATE_ID = os.environ.get("FORM_TEMPLATE_ID", "").strip()
+
+PLACEHOLDER_TITLE = "Untitled Quiz (reserved)"
+
+
+def provision_quiz_form(forms_service, drive_service, template_form_id=None):
+    """
+    Create an empty quiz form ready to receive questions.
+
+    The form already has quiz mode enabled and the required Name field at
+    index 0, which is exactly what create_quiz_form builds first for every
+    new form.
+
+    Args:
+        forms_service: Google Forms API service object
+        drive_service: Google Drive API service object
+        template_form_id (str): Optional master form to copy with Drive
+
+    Returns:
+        str: Id of the provisioned form
+    """
+    if template_form_id:
+        copied = drive_service.files().copy(
+            fileId=template_form_id,
+            body={"name": PLACEHOLDER_TITLE},
+            fields="id"
+        ).execute()
+        return copied["id"]
+
+    form = forms_service.forms().create(body={
+        "info": {"title": PLACEHOLDER_TITLE}
+    }).execute()
+    form_id = form["formId"]
+    forms_service.forms().batchUpdate(formId=form_id, body={"requests": [
+        {
+            "updateSettings": {
+                "settings": {"quizSettings": {"isQuiz": True}},
+                "updateMask": "quizSettings.isQuiz"
+            }
+        },
+        {
+            "createItem": {
+                "item": {
+                    "title": "Name",
+                    "questionItem": {
+                        "question": {"required": True, "textQuestion": {}}
+                    }
+                },
+                "location": {"index": 0}
+            }
+        }
+    ]}).execute()
+    return form_id
+
+
+class FormPool:
+    """
+    Per-user pool of pre-provisioned empty quiz forms, filled in the background.
+
+    Forms are only handed out by the process that created them. Placeholders
+    left in Drive by other processes are never adopted, since replicas or
+    overlapping restarts could then publish two quizzes into one form.
+    Unused forms are deleted when the process exits.
+    """
+
+    def __init__(self, target_size, template_form_id=None, max_workers=2):
+        self.target_size = target_size
+        self.template_form_id = template_form_id or None
+        self._forms = defaultdict(deque)
+        self._pending = defaultdict(int)
+        self._credentials = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="form-pool")
+
+    @property
+    def enabled(self):
+        return self.target_size > 0
+
+    def size(self, user_key):
+        with self._lock:
+            return len(self._forms[user_key])
+
+    def acquire(self, user_key):
+        """Take a ready form for this user, or None if the pool is empty."""
+        with self._lock:
+            if self._forms[user_key]:
+                return self._forms[user_key].popleft()
+        return None
+
+    def top_up(self, user_key, credentials):
+        """Schedule background provisioning until the user's pool is full again."""
+        if not self.enabled or not user_key or not credentials:
+            return
+        with self._lock:
+            self._credentials[user_key] = credentials
+            missing = self.target_size - len(self._forms[user_key]) - self._pending[user_key]
+            if missing <= 0:
+                return
+            self._pending[user_key] += missing
+
+        for _ in range(missing):
+            self._executor.submit(self._provision_one, user_key, credentials)
+
+    def _services(self, credentials):
+        # The pooled transport is thread-safe, so workers share the user's clients
+        services = get_services(credentials)
+        return services["forms"], services["drive"]
+
+    def _provision_one(self, user_key, credentials):
+        try:
+            forms_service, drive_service = self._services(credentials)
+            form_id = provision_quiz_form(forms_service, drive_service, self.template_form_id)
+            with self._lock:
+                self._forms[user_key].append(form_id)
+        except Exception as e:
+            print(f"⚠️ Could not pre-create a quiz form for {user_key}: {e}")
+        finally:
+            with self._lock:
+                self._pending[user_key] -= 1
+
+    def discard_all(self):
+        """Delete every form still waiting in the pool, so no placeholders are left in Drive."""
+        with self._lock:
+            leftovers = [(user_key, list(forms)) for user_key, forms in self._forms.items() if forms]
+            self._forms.clear()
+        for user_key, form_ids in leftovers:
+            try:
+                _, drive_service = self._services(self._credentials[user_key])
+                for form_id in form_ids:
+                    drive_service.files().delete(fileId=form_id).execute()
+            except Exception as e:
+                print(f"⚠️ Could not delete pooled forms for {user_key}: {e}")
+
+
+@st.cache_resource
+def get_form_pool():
+    """Process-wide form pool configured from FORM_POOL_SIZE / FORM_TEMPLATE_ID."""
+    pool = FormPool(FORM_POOL_SIZE, FORM_TEMPLATE_ID)
+    if pool.enabled:
+        atexit.register(pool.discard_all)
+    return pool
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import random
 
 import re
@@ -54,6 +56,42 @@ def normalize_mcq_answer(answer: str, options: list) -> str:
     return ""
 
 
+def new_publish_checkpoint(quiz, form_title):
+    """
+    Create an empty publishing checkpoint for a draft quiz.
+
+    The checkpoint is a plain dict so it can live in st.session_state (or be
+    stored in Mongo) and survive a failed or interrupted publish. Passing the
+    same checkpoint back into create_quiz_form resumes from the last
+    completed step and reuses the already created form.
+
+    Args:
+        quiz (dict): Draft quiz with 'mcq' and 'fill' arrays
+        form_title (str): Title the form will be published with
+
+    Returns:
+        dict: Fresh checkpoint bound to this quiz and title
+    """
+    return {
+        "quiz_key": _quiz_key(quiz, form_title),
+        "form_id": None,
+        "prepared": False,
+        "renamed": False,
+        "mcqs": None,
+        "fills": None,
+        "mcq_item_ids": None,
+        "fill_item_ids": None,
+        "quiz_settings_applied": False,
+        "grading_applied": False,
+        "shared_emails": []
+    }
+
+
+def _quiz_key(quiz, form_title):
+    payload = json.dumps({"quiz": quiz, "title": form_title}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def create_quiz_form(
     forms_service,
     drive_service,
@@ -62,7 +100,9 @@ def create_quiz_form(
     form_title,
     release_scores_immediately=True,
     shuffle_questions=True,
-    shuffle_options=True
+    shuffle_options=True,
+    checkpoint=None,
+    prepared_form_id=None
 ):
     """
     Create a Google Form with quiz questions and auto-grading.
@@ -73,61 +113,180 @@ def create_quiz_form(
         quiz (dict): Generated quiz data with 'mcq' and 'fill' arrays
         educator_emails (list): List of email addresses to share form with
         form_title (str): Title for the Google Form
+        checkpoint (dict): Optional checkpoint from new_publish_checkpoint.
+            It is updated in place after every completed step, so a retry
+            with the same dict resumes instead of creating another form.
+        prepared_form_id (str): Optional id of a pre-provisioned empty quiz
+            form (see modules.form_pool) to publish into instead of creating one
     """
     form_title = form_title.strip() or "Generated Quiz Form"
-    # Google Forms API does not support collectEmail via API; must be set manually in UI
-    form = forms_service.forms().create(body={
-        "info": {"title": form_title}
-    }).execute()
-    form_id = form["formId"]
-
-    drive_service.files().update(
-        fileId=form_id,
-        body={"name": form_title},
-        fields="id"
-    ).execute()
-
-    # Initial settings + Name field
-    requests = [
-        {
-            "updateSettings": {
-                "settings": {"quizSettings": {"isQuiz": True}},
-                "updateMask": "quizSettings.isQuiz"
-            }
-        },
-        {
-            "createItem": {
-                "item": {
-                    "title": "Name",
-                    "questionItem": {
-                        "question": {"required": True, "textQuestion": {}}
+    if checkpoint is None or checkpoint.get("quiz_key") != _quiz_key(quiz, form_title):
+        fresh = new_publish_checkpoint(quiz, form_title)
+        if checkpoint is None:
+            checkpoint = fresh
+        else:
+            checkpoint.clear()
+            checkpoint.update(fresh)
+
+    if checkpoint["form_id"]:
+        st.info("🔄 Resuming publishing of the previously created form...")
+    elif prepared_form_id:
+        # Already a quiz with the Name field, only questions and grading are missing
+        checkpoint["form_id"] = prepared_form_id
+        checkpoint["prepared"] = True
+    else:
+        # Google Forms API does not support collectEmail via API; must be set manually in UI
+        form = forms_service.forms().create(body={
+            "info": {"title": form_title}
+        }).execute()
+        checkpoint["form_id"] = form["formId"]
+    form_id = checkpoint["form_id"]
+
+    if not checkpoint["renamed"]:
+        drive_service.files().update(
+            fileId=form_id,
+            body={"name": form_title},
+            fields="id"
+        ).execute()
+        checkpoint["renamed"] = True
+
+    # Freeze the shuffled order so item ids keep matching their questions on retry
+    if checkpoint["mcqs"] is None:
+        mcqs = list(quiz.get("mcq", []))
+        fills = list(quiz.get("fill", []))
+        if shuffle_questions:
+            random.shuffle(mcqs)
+            random.shuffle(fills)
+        checkpoint["mcqs"] = mcqs
+        checkpoint["fills"] = fills
+    mcqs = checkpoint["mcqs"]
+    fills = checkpoint["fills"]
+
+    if checkpoint["mcq_item_ids"] is None:
+        if checkpoint["prepared"]:
+            requests = [
+                {
+                    "updateFormInfo": {
+                        "info": {"title": form_title},
+                        "updateMask": "title"
+                    }
+                }
+            ]
+            name_items = 0
+        else:
+            # Initial settings + Name field
+            requests = [
+                {
+                    "updateSettings": {
+                        "settings": {"quizSettings": {"isQuiz": True}},
+                        "updateMask": "quizSettings.isQuiz"
                     }
                 },
-                "location": {"index": 0}
-            }
-        }
-    ]
-
-    idx = 1
-    def remove_duplicates(options):
-        seen = set()
-        unique = []
-        for opt in options:
-            if opt not in seen:
-                unique.append(opt)
-                seen.add(opt)
-        return unique
-
-    mcqs = list(quiz.get("mcq", []))
-    fills = list(quiz.get("fill", []))
-
-    if shuffle_questions:
-        random.shuffle(mcqs)
-        random.shuffle(fills)
+                {
+                    "createItem": {
+                        "item": {
+                            "title": "Name",
+                            "questionItem": {
+                                "question": {"required": True, "textQuestion": {}}
+                            }
+                        },
+                        "location": {"index": 0}
+                    }
+                }
+            ]
+            name_items = 1
+        requests.extend(_question_item_requests(mcqs, fills, shuffle_options, start_index=1))
+
+        response = forms_service.forms().batchUpdate(formId=form_id, body={"requests": requests}).execute()
+
+        item_ids = [r["createItem"]["itemId"] for r in response.get("replies", []) if "createItem" in r]
+        checkpoint["mcq_item_ids"] = item_ids[name_items:name_items + len(mcqs)]
+        checkpoint["fill_item_ids"] = item_ids[name_items + len(mcqs):]
+
+    if not checkpoint["quiz_settings_applied"]:
+        # Best effort score release preference. Some Forms tenants may reject this field.
+        release_grade = "IMMEDIATELY" if release_scores_immediately else "LATER"
+        try:
+            forms_service.forms().batchUpdate(
+                formId=form_id,
+                body={
+                    "requests": [
+                        {
+                            "updateSettings": {
+                                "settings": {
+                                    "quizSettings": {
+                                        "releaseGrade": release_grade,
+                                        "shuffleQuestions": shuffle_questions,
+                                        "shuffleOptions": shuffle_options
+                                    }
+                                },
+                                "updateMask": "quizSettings.releaseGrade,quizSettings.shuffleQuestions,quizSettings.shuffleOptions"
+                            }
+                        }
+                    ]
+                }
+            ).execute()
+        except Exception:
+            pass
+        checkpoint["quiz_settings_applied"] = True
+
+    if not checkpoint["grading_applied"]:
+        grading_requests = _grading_requests(mcqs, fills, checkpoint["mcq_item_ids"], checkpoint["fill_item_ids"])
+        if grading_requests:
+            forms_service.forms().batchUpdate(formId=form_id, body={"requests": grading_requests}).execute()
+        checkpoint["grading_applied"] = True
+
+    # Share form with educators
+    granted = []
+    failed = []
+
+    for email in educator_emails:
+        if email in checkpoint["shared_emails"]:
+            granted.append(email)
+            continue
+        try:
+            drive_service.permissions().create(
+                fileId=form_id,
+                body={"type": "user", "role": "writer", "emailAddress": email},
+                sendNotificationEmail=True,
+                fields='id'
+            ).execute()
+            granted.append(email)
+            checkpoint["shared_emails"].append(email)
+        except Exception as e:
+            failed.append(email)
+            st.warning(f"❌ Failed to grant edit access to {email}: {e}")
+
+    if granted:
+        st.info(f"✅ Editor access granted to: {', '.join(granted)}")
+    if failed and not granted:
+        st.error("❌ Failed to grant access to all provided emails.")
+
+    # ✅ Print only once
+    st.success("✅ Quiz Form Created with Auto-Grading!")
+    st.markdown(f"[📝 Open Form](https://docs.google.com/forms/d/{form_id}/edit)")
+    st.info("ℹ️ To collect student emails, open the form in Google Forms and enable 'Collect email addresses' in the Responses settings.")
+    return f"https://docs.google.com/forms/d/{form_id}/edit"
+
+
+def _remove_duplicates(options):
+    seen = set()
+    unique = []
+    for opt in options:
+        if opt not in seen:
+            unique.append(opt)
+            seen.add(opt)
+    return unique
+
+
+def _question_item_requests(mcqs, fills, shuffle_options, start_index):
+    """Build createItem requests for the MCQ and FIB questions."""
+    requests = []
+    idx = start_index
 
     for q in mcqs:
         # Remove duplicate options before sending to Google Forms
-        unique_options = remove_duplicates(q["options"])
+        unique_options = _remove_duplicates(q["options"])
         if shuffle_options:
             random.shuffle(unique_options)
         requests.append({
@@ -167,36 +326,11 @@ def create_quiz_form(
         })
         idx += 1
 
-    response = forms_service.forms().batchUpdate(formId=form_id, body={"requests": requests}).execute()
-
-    # Best effort score release preference. Some Forms tenants may reject this field.
-    release_grade = "IMMEDIATELY" if release_scores_immediately else "LATER"
-    try:
-        forms_service.forms().batchUpdate(
-            formId=form_id,
-            body={
-                "requests": [
-                    {
-                        "updateSettings": {
-                            "settings": {
-                                "quizSettings": {
-                                    "releaseGrade": release_grade,
-                                    "shuffleQuestions": shuffle_questions,
-                                    "shuffleOptions": shuffle_options
-                                }
-                            },
-                            "updateMask": "quizSettings.releaseGrade,quizSettings.shuffleQuestions,quizSettings.shuffleOptions"
-                        }
-                    }
-                ]
-            }
-        ).execute()
-    except Exception:
-        pass
+    return requests
 
-    item_ids = [r["createItem"]["itemId"] for r in response.get("replies", []) if "createItem" in r]
 
-    # Grading requests
+def _grading_requests(mcqs, fills, mcq_item_ids, fill_item_ids):
+    """Build updateItem grading requests for already created question items."""
     grading_requests = []
     for i, q in enumerate(mcqs):
         raw_correct = q.get("answer", "")
@@ -207,7 +341,7 @@ def create_quiz_form(
         grading_requests.append({
             "updateItem": {
                 "item": {
-                    "itemId": item_ids[i + 1],
+                    "itemId": mcq_item_ids[i],
                     "questionItem": {
                         "question": {
                             "grading": {
@@ -232,7 +366,7 @@ def create_quiz_form(
         grading_requests.append({
             "updateItem": {
                 "item": {
-                    "itemId": item_ids[len(mcqs) + j + 1],
+                    "itemId": fill_item_ids[j],
                     "questionItem": {
                         "question": {
                             "grading": {
@@ -249,33 +383,4 @@ def create_quiz_form(
             }
         })
 
-    if grading_requests:
-        forms_service.forms().batchUpdate(formId=form_id, body={"requests": grading_requests}).execute()
-
-    # Share form with educators
-    granted = []
-    failed = []
-
-    for email in educator_emails:
-        try:
-            drive_service.permissions().create(
-                fileId=form_id,
-                body={"type": "user", "role": "writer", "emailAddress": email},
-                sendNotificationEmail=True,
-                fields='id'
-            ).execute()
-            granted.append(email)
-        except Exception as e:
-            failed.append(email)
-            st.warning(f"❌ Failed to grant edit access to {email}: {e}")
-
-    if granted:
-        st.info(f"✅ Editor access granted to: {', '.join(granted)}")
-    if failed and not granted:
-        st.error("❌ Failed to grant access to all provided emails.")
-
-    # ✅ Print only once
-    st.success("✅ Quiz Form Created with Auto-Grading!")
-    st.markdown(f"[📝 Open Form](https://docs.google.com/forms/d/{form_id}/edit)")
-    st.info("ℹ️ To collect student emails, open the form in Google Forms and enable 'Collect email addresses' in the Responses settings.")
-    return f"https://docs.google.com/forms/d/{form_id}/edit"
+    return grading_requests
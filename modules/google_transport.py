@@ -0,0 +1,169 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from urllib.parse import urlsplit
+
+import httplib2
+import requests
+from google.auth.transport.requests import AuthorizedSession
+from googleapiclient.discovery import build
+from requests.adapters import HTTPAdapter
+
+# Keep-alive connections kept per host by each pooled session
+GOOGLE_API_POOL_SIZE = int(os.environ.get("GOOGLE_API_POOL_SIZE", "10"))
+# Connect and read timeouts applied to every Forms/Drive request
+GOOGLE_API_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("GOOGLE_API_CONNECT_TIMEOUT_SECONDS", "5"))
+GOOGLE_API_TIMEOUT_SECONDS = float(os.environ.get("GOOGLE_API_TIMEOUT_SECONDS", "30"))
+# Number of users whose pooled sessions and service objects are kept
+SERVICE_CACHE_SIZE = 64
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+# Path segments that are resource ids (form ids, file ids, permission ids)
+ID_SEGMENT_RE = re.compile(r"^[A-Za-z0-9_-]{16,}$")
+
+
+def endpoint_name(method, uri):
+    """'POST forms.googleapis.com/v1/forms/{id}:batchUpdate' for a concrete request URI."""
+    parts = urlsplit(uri)
+    segments = []
+    for segment in parts.path.split("/"):
+        name, colon, verb = segment.partition(":")
+        segments.append(("{id}" if ID_SEGMENT_RE.match(name) else name) + colon + verb)
+    return f"{method} {parts.netloc}{'/'.join(segments)}"
+
+
+class EndpointMetrics:
+    """Request counts, errors and a latency histogram per endpoint."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(lambda: {"count": 0, "errors": 0, "seconds": 0.0, "histogram": [0] * len(self.buckets)})
+
+    def record(self, endpoint, seconds, failed):
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats["count"] += 1
+            stats["errors"] += int(failed)
+            stats["seconds"] += seconds
+            stats["histogram"][bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self):
+        """One row per endpoint with count, errors, mean latency and cumulative bucket counts."""
+        with self._lock:
+            rows = []
+            for endpoint, stats in sorted(self._endpoints.items()):
+                row = {
+                    "endpoint": endpoint,
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "mean_ms": round(1000 * stats["seconds"] / stats["count"], 1)
+                }
+                cumulative = 0
+                for bound, hits in zip(self.buckets, stats["histogram"]):
+                    cumulative += hits
+                    row["le_inf" if bound == float("inf") else f"le_{bound:g}s"] = cumulative
+                rows.append(row)
+            return rows
+
+
+metrics = EndpointMetrics()
+
+
+class PooledHttp:
+    """
+    httplib2.Http stand-in for discovery clients, backed by an AuthorizedSession.
+
+    requests keeps a pool of keep-alive connections that can be used from
+    several threads at once, unlike httplib2.Http. Credentials are refreshed
+    by the session, every request gets a timeout, and each call is recorded
+    in the endpoint metrics.
+    """
+
+    def __init__(self, credentials, pool_size=GOOGLE_API_POOL_SIZE, timeout=None):
+        self.credentials = credentials
+        self.timeout = timeout or (GOOGLE_API_CONNECT_TIMEOUT_SECONDS, GOOGLE_API_TIMEOUT_SECONDS)
+        self.session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        endpoint = endpoint_name(method, uri)
+        started = time.monotonic()
+        failed = True
+        try:
+            response = self.session.request(
+                method,
+                uri,
+                data=body,
+                headers=headers,
+                timeout=self.timeout,
+                allow_redirects=redirections > 0
+            )
+            failed = response.status_code >= 400
+        except requests.exceptions.Timeout as e:
+            # googleapiclient retries on the built-in socket errors, not on requests' own
+            raise TimeoutError(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectionError(str(e)) from e
+        finally:
+            metrics.record(endpoint, time.monotonic() - started, failed)
+
+        info = dict(response.headers)
+        info["status"] = str(response.status_code)
+        return httplib2.Response(info), response.content
+
+    def close(self):
+        self.session.close()
+
+
+def _credentials_key(credentials):
+    identity = getattr(credentials, "refresh_token", None) or getattr(credentials, "token", None) or str(id(credentials))
+    return hashlib.sha256(f"{getattr(credentials, 'client_id', '')}:{identity}".encode("utf-8")).hexdigest()
+
+
+_services = OrderedDict()
+_services_lock = threading.Lock()
+
+
+def get_services(credentials):
+    """
+    Forms and Drive clients sharing one pooled transport per user.
+
+    The clients are built once per set of credentials and are safe to use
+    from several threads, so callers should reuse them instead of calling
+    build() per request.
+
+    Returns:
+        dict: {'forms': Forms v1 service, 'drive': Drive v3 service}
+    """
+    key = _credentials_key(credentials)
+    with _services_lock:
+        services = _services.get(key)
+        if services is not None:
+            _services.move_to_end(key)
+            return services
+
+    http = PooledHttp(credentials)
+    services = {
+        "forms": build("forms", "v1", http=http, cache_discovery=False),
+        "drive": build("drive", "v3", http=http, cache_discovery=False)
+    }
+    with _services_lock:
+        existing = _services.get(key)
+        if existing is not None:
+            http.close()
+            return existing
+        _services[key] = services
+        while len(_services) > SERVICE_CACHE_SIZE:
+            _, evicted = _services.popitem(last=False)
+            evicted["forms"]._http.close()
+    return services
+
+
+def transport_metrics():
+    return metrics.snapshot()
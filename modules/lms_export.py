@@ -0,0 +1,402 @@
+import csv
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from modules.forms_manager import generate_fib_variants, normalize_mcq_answer
+
+QTI_NAMESPACE = "http://www.imsglobal.org/xsd/imsqti_v2p1"
+QTI_MATCH_CORRECT = "http://www.imsglobal.org/question/qti_v2p1/rptemplates/match_correct"
+QTI_MAP_RESPONSE = "http://www.imsglobal.org/question/qti_v2p1/rptemplates/map_response"
+CSV_COLUMNS = ["quiz", "number", "type", "question", "options", "answer", "accepted_answers"]
+# Characters with a meaning in GIFT markup, escaped with a backslash inside text
+GIFT_SPECIAL_RE = re.compile(r"([~=#{}:\\])")
+
+
+def accepted_answers(answer):
+    """Accepted fill-in-the-blank answers, the answer as written first and the other variants in a stable order."""
+    base = (answer or "").strip()
+    return [base] + sorted(variant for variant in generate_fib_variants(base) if variant and variant != base)
+
+
+def case_insensitive_answers(answers):
+    """Accepted answers with case-only variants removed, for formats that compare answers ignoring case."""
+    distinct = {}
+    for answer in answers:
+        distinct.setdefault(answer.casefold(), answer)
+    return list(distinct.values())
+
+
+def _xml_text(text):
+    return escape(str(text or ""))
+
+
+class MoodleXmlWriter:
+    """Moodle XML: one category per quiz, multichoice and shortanswer questions."""
+
+    extension = "xml"
+    mime = "application/xml"
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        self.out.write('<?xml version="1.0" encoding="UTF-8"?>\n<quiz>\n')
+
+    def write_quiz(self, title, mcqs, fills):
+        self.out.write(
+            '  <question type="category">\n'
+            f'    <category><text>$course$/top/{_xml_text(title)}</text></category>\n'
+            '  </question>\n'
+        )
+        for number, (question, options, answer) in enumerate(mcqs, start=1):
+            answers = "".join(
+                f'    <answer fraction="{100 if option == answer else 0}" format="plain_text"><text>{_xml_text(option)}</text></answer>\n'
+                for option in options
+            )
+            self.out.write(
+                '  <question type="multichoice">\n'
+                f'    <name><text>MCQ {number}</text></name>\n'
+                f'    <questiontext format="plain_text"><text>{_xml_text(question)}</text></questiontext>\n'
+                '    <defaultgrade>1</defaultgrade>\n'
+                '    <single>true</single>\n'
+                '    <shuffleanswers>true</shuffleanswers>\n'
+                '    <answernumbering>abc</answernumbering>\n'
+                f'{answers}'
+                '  </question>\n'
+            )
+        for number, (question, answers) in enumerate(fills, start=1):
+            # usecase 0 ignores case, so case variants would be duplicate answers
+            accepted = "".join(
+                f'    <answer fraction="100" format="plain_text"><text>{_xml_text(answer)}</text></answer>\n'
+                for answer in case_insensitive_answers(answers)
+            )
+            self.out.write(
+                '  <question type="shortanswer">\n'
+                f'    <name><text>FIB {number}</text></name>\n'
+                f'    <questiontext format="plain_text"><text>{_xml_text(question)}</text></questiontext>\n'
+                '    <defaultgrade>1</defaultgrade>\n'
+                '    <usecase>0</usecase>\n'
+                f'{accepted}'
+                '  </question>\n'
+            )
+
+    def end(self):
+        self.out.write('</quiz>\n')
+
+
+def _gift_text(text):
+    return GIFT_SPECIAL_RE.sub(r"\\\1", " ".join(str(text or "").split()))
+
+
+class GiftWriter:
+    """GIFT text format: a $CATEGORY line per quiz, then one block per question."""
+
+    extension = "gift.txt"
+    mime = "text/plain"
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        pass
+
+    def write_quiz(self, title, mcqs, fills):
+        self.out.write(f"$CATEGORY: $course$/top/{_gift_text(title)}\n\n")
+        for number, (question, options, answer) in enumerate(mcqs, start=1):
+            choices = "".join(f"    {'=' if option == answer else '~'}{_gift_text(option)}\n" for option in options)
+            self.out.write(f"::MCQ {number}:: {_gift_text(question)} {{\n{choices}}}\n\n")
+        for number, (question, answers) in enumerate(fills, start=1):
+            accepted = " ".join(f"={_gift_text(answer)}" for answer in case_insensitive_answers(answers))
+            self.out.write(f"::FIB {number}:: {_gift_text(question)} {{{accepted}}}\n\n")
+
+    def end(self):
+        pass
+
+
+class CsvWriter:
+    """One row per question; options and accepted answers are joined with ' | '."""
+
+    extension = "csv"
+    mime = "text/csv"
+
+    def __init__(self, out):
+        self.writer = csv.writer(out)
+
+    def begin(self):
+        self.writer.writerow(CSV_COLUMNS)
+
+    def write_quiz(self, title, mcqs, fills):
+        for number, (question, options, answer) in enumerate(mcqs, start=1):
+            self.writer.writerow([title, number, "mcq", question, " | ".join(options), answer, answer])
+        for number, (question, answers) in enumerate(fills, start=1):
+            self.writer.writerow([title, number, "fill", question, "", answers[0], " | ".join(answers)])
+
+    def end(self):
+        pass
+
+
+class QtiPackageWriter:
+    """
+    IMS QTI 2.1 content package: one assessmentItem file per question, one
+    assessmentTest per quiz and an imsmanifest.xml listing them all.
+
+    Items are written to the zip as they arrive. The manifest entries are
+    spooled to a temporary file and copied in at the end; only the zip
+    directory, a few hundred bytes per question, is kept in memory.
+    """
+
+    extension = "qti.zip"
+    mime = "application/zip"
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.quiz_number = 0
+        self.resources = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+
+    def begin(self):
+        pass
+
+    def _write_file(self, name, content):
+        with self.archive.open(name, "w", force_zip64=True) as f:
+            f.write(content.encode("utf-8"))
+
+    def _add_resource(self, identifier, kind, href, dependencies=()):
+        depends = "".join(f'<dependency identifierref="{dependency}"/>' for dependency in dependencies)
+        self.resources.write(
+            f'    <resource identifier="{identifier}" type="imsqti_{kind}_xmlv2p1" href="{href}">'
+            f'<file href="{href}"/>{depends}</resource>\n'
+        )
+
+    def _item(self, identifier, title, declaration, body, processing):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<assessmentItem xmlns="{QTI_NAMESPACE}" identifier="{identifier}" title={quoteattr(title)} '
+            'adaptive="false" timeDependent="false">\n'
+            f'{declaration}'
+            '  <outcomeDeclaration identifier="SCORE" cardinality="single" baseType="float"/>\n'
+            f'  <itemBody>\n{body}  </itemBody>\n'
+            f'  <responseProcessing template="{processing}"/>\n'
+            '</assessmentItem>\n'
+        )
+
+    def _mcq_item(self, identifier, number, question, options, answer):
+        correct = f"C{options.index(answer) + 1}"
+        choices = "".join(
+            f'      <simpleChoice identifier="C{index}">{_xml_text(option)}</simpleChoice>\n'
+            for index, option in enumerate(options, start=1)
+        )
+        declaration = (
+            '  <responseDeclaration identifier="RESPONSE" cardinality="single" baseType="identifier">\n'
+            f'    <correctResponse><value>{correct}</value></correctResponse>\n'
+            '  </responseDeclaration>\n'
+        )
+        body = (
+            '    <choiceInteraction responseIdentifier="RESPONSE" shuffle="true" maxChoices="1">\n'
+            f'      <prompt>{_xml_text(question)}</prompt>\n'
+            f'{choices}'
+            '    </choiceInteraction>\n'
+        )
+        return self._item(identifier, f"MCQ {number}", declaration, body, QTI_MATCH_CORRECT)
+
+    def _fill_item(self, identifier, number, question, answers):
+        # Keys differing only in case collide under caseSensitive="false"
+        answers = case_insensitive_answers(answers)
+        entries = "".join(
+            f'      <mapEntry mapKey={quoteattr(answer)} mappedValue="1" caseSensitive="false"/>\n'
+            for answer in answers
+        )
+        declaration = (
+            '  <responseDeclaration identifier="RESPONSE" cardinality="single" baseType="string">\n'
+            f'    <correctResponse><value>{_xml_text(answers[0])}</value></correctResponse>\n'
+            f'    <mapping defaultValue="0" upperBound="1">\n{entries}    </mapping>\n'
+            '  </responseDeclaration>\n'
+        )
+        expected_length = max(len(answer) for answer in answers) + 5
+        body = (
+            f'    <p>{_xml_text(question)} '
+            f'<textEntryInteraction responseIdentifier="RESPONSE" expectedLength="{expected_length}"/></p>\n'
+        )
+        return self._item(identifier, f"FIB {number}", declaration, body, QTI_MAP_RESPONSE)
+
+    def write_quiz(self, title, mcqs, fills):
+        self.quiz_number += 1
+        prefix = f"quiz{self.quiz_number:06d}"
+        items = []
+        for number, (question, options, answer) in enumerate(mcqs, start=1):
+            items.append((f"{prefix}_mcq{number}", self._mcq_item(f"{prefix}_mcq{number}", number, question, options, answer)))
+        for number, (question, answers) in enumerate(fills, start=1):
+            items.append((f"{prefix}_fib{number}", self._fill_item(f"{prefix}_fib{number}", number, question, answers)))
+
+        for identifier, content in items:
+            href = f"{prefix}/{identifier}.xml"
+            self._write_file(href, content)
+            self._add_resource(identifier, "item", href)
+
+        refs = "".join(
+            f'        <assessmentItemRef identifier="{identifier}_ref" href="{identifier}.xml"/>\n'
+            for identifier, _ in items
+        )
+        test_href = f"{prefix}/test.xml"
+        self._write_file(test_href, (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<assessmentTest xmlns="{QTI_NAMESPACE}" identifier="{prefix}" title={quoteattr(title)}>\n'
+            '  <testPart identifier="part1" navigationMode="nonlinear" submissionMode="simultaneous">\n'
+            f'    <assessmentSection identifier="section1" title={quoteattr(title)} visible="true">\n'
+            f'{refs}'
+            '    </assessmentSection>\n'
+            '  </testPart>\n'
+            '</assessmentTest>\n'
+        ))
+        self._add_resource(prefix, "test", test_href, [identifier for identifier, _ in items])
+
+    def end(self):
+        self.resources.seek(0)
+        with self.archive.open("imsmanifest.xml", "w", force_zip64=True) as f:
+            f.write(
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<manifest xmlns="http://www.imsglobal.org/xsd/imscp_v1p1" identifier="quiz_export">\n'
+                '  <organizations/>\n'
+                '  <resources>\n'.encode("utf-8")
+            )
+            for line in self.resources:
+                f.write(line.encode("utf-8"))
+            f.write('  </resources>\n</manifest>\n'.encode("utf-8"))
+        self.resources.close()
+
+
+EXPORT_FORMATS = {
+    "moodle": MoodleXmlWriter,
+    "gift": GiftWriter,
+    "qti": QtiPackageWriter,
+    "csv": CsvWriter
+}
+# Labels shown in the app, mapped to export formats
+EXPORT_FORMAT_CHOICES = {
+    "Moodle XML": "moodle",
+    "GIFT": "gift",
+    "QTI 2.1 (zip)": "qti",
+    "CSV": "csv"
+}
+
+
+def export_basename(title):
+    """A file-name-safe version of a quiz title."""
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", title or "").strip("_")[:80] or "quiz"
+
+
+def export_filename(base, fmt, zipped=False):
+    """File name for an export in this format, e.g. 'quiz.xml' or 'quiz.xml.zip'."""
+    name = f"{base}.{EXPORT_FORMATS[fmt].extension}"
+    return f"{name}.zip" if zipped and fmt != "qti" else name
+
+
+def export_mime(fmt, zipped=False):
+    return "application/zip" if zipped else EXPORT_FORMATS[fmt].mime
+
+
+def _prepare(quiz):
+    """
+    Split a quiz into exportable MCQs and fill-ins.
+
+    MCQ options are stripped and repeats removed, so a single-answer question
+    never has two correct choices. MCQs whose answer matches no option are
+    dropped.
+    """
+    mcqs = []
+    skipped = 0
+    for question in quiz.get("mcq", []):
+        options = list(dict.fromkeys(option.strip() for option in question.get("options", [])))
+        answer = normalize_mcq_answer(question.get("answer", ""), options)
+        if not answer:
+            skipped += 1
+            continue
+        mcqs.append((question.get("question", ""), options, answer))
+    fills = []
+    for question in quiz.get("fill", []):
+        if not (question.get("answer") or "").strip():
+            skipped += 1
+            continue
+        fills.append((question.get("question", ""), accepted_answers(question["answer"])))
+    return mcqs, fills, skipped
+
+
+def export_quizzes(quizzes, out, fmt="moodle", zipped=False):
+    """
+    Stream quizzes to a binary file-like object in an LMS import format.
+
+    Each quiz is converted and written as soon as it is read from the
+    iterable, so a generator over the quiz history can be exported without
+    holding it in memory. QTI is always a zip package; the other formats are
+    a single file, optionally wrapped in a zip. The output does not need to
+    be seekable.
+
+    Args:
+        quizzes: Iterable of (title, quiz) pairs, where quiz is a dict with
+            'mcq' and 'fill' lists
+        out: Binary file-like object to write to
+        fmt (str): 'moodle', 'gift', 'qti' or 'csv'
+        zipped (bool): Compress single-file formats into a zip
+
+    Returns:
+        dict: Number of 'quizzes' and 'questions' written and questions
+            'skipped' because their answer could not be resolved
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    counts = {"quizzes": 0, "questions": 0, "skipped": 0}
+
+    def write_all(writer):
+        writer.begin()
+        for title, quiz in quizzes:
+            mcqs, fills, skipped = _prepare(quiz or {})
+            writer.write_quiz(title or "Untitled quiz", mcqs, fills)
+            counts["quizzes"] += 1
+            counts["questions"] += len(mcqs) + len(fills)
+            counts["skipped"] += skipped
+        writer.end()
+
+    if fmt == "qti" or zipped:
+        with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            if fmt == "qti":
+                write_all(QtiPackageWriter(archive))
+            else:
+                with archive.open(export_filename("quizzes", fmt), "w", force_zip64=True) as member:
+                    _write_text(member, fmt, write_all)
+    else:
+        _write_text(out, fmt, write_all)
+    return counts
+
+
+def _write_text(out, fmt, write_all):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="" if fmt == "csv" else None, write_through=True)
+    try:
+        write_all(EXPORT_FORMATS[fmt](text))
+        text.flush()
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+
+def export_quiz_bytes(title, quiz, fmt="moodle"):
+    """A single quiz exported to bytes, for download buttons."""
+    buffer = io.BytesIO()
+    export_quizzes([(title, quiz)], buffer, fmt)
+    return buffer.getvalue()
+
+
+def export_to_file(quizzes, path, fmt="moodle", zipped=False):
+    """Export to a file path, writing to a temporary file first so a failed export leaves no partial file."""
+    with tempfile.NamedTemporaryFile(delete=False, dir=os.path.dirname(os.path.abspath(path)), suffix=".part") as temp:
+        try:
+            counts = export_quizzes(quizzes, temp, fmt, zipped)
+        except BaseException:
+            temp.close()
+            os.remove(temp.name)
+            raise
+    shutil.move(temp.name, path)
+    return counts
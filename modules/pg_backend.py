@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
+from psycopg_pool import ConnectionPool
+
+# "mongo" (default) or "postgres": where quiz records are written and listed from
+QUIZ_STORAGE_BACKEND = os.environ.get("QUIZ_STORAGE_BACKEND", "mongo").strip().lower()
+PG_POOL_MIN_SIZE = int(os.environ.get("PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE = int(os.environ.get("PG_POOL_MAX_SIZE", "10"))
+EXPORT_FETCH_SIZE = 2000
+
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS quiz_results (
+        quiz_id SERIAL PRIMARY KEY,
+        date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        files_uploaded TEXT,
+        user_prompt TEXT,
+        difficulty TEXT,
+        form_title TEXT NOT NULL,
+        form_link TEXT NOT NULL,
+        editor_emails TEXT NOT NULL
+    )
+    """,
+    # Columns added after the original table; kept separate so old tables are upgraded in place
+    "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS generation_id TEXT",
+    "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS created_by TEXT",
+    "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS source_hash TEXT",
+    "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS sources JSONB NOT NULL DEFAULT '[]'",
+    "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS quiz_data JSONB NOT NULL DEFAULT '{}'",
+    "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS settings JSONB NOT NULL DEFAULT '{}'",
+    "CREATE UNIQUE INDEX IF NOT EXISTS quiz_results_generation_id ON quiz_results (generation_id)",
+    "CREATE INDEX IF NOT EXISTS quiz_results_created_by_date ON quiz_results (created_by, date_created DESC, quiz_id DESC)",
+    "CREATE INDEX IF NOT EXISTS quiz_results_source_hash ON quiz_results (source_hash)",
+    "CREATE INDEX IF NOT EXISTS quiz_results_quiz_data_gin ON quiz_results USING GIN (quiz_data jsonb_path_ops)",
+    "CREATE INDEX IF NOT EXISTS quiz_results_sources_gin ON quiz_results USING GIN (sources jsonb_path_ops)"
+]
+
+INSERT_SQL = """
+    INSERT INTO quiz_results (
+        generation_id, date_created, created_by, source_hash, files_uploaded, sources,
+        user_prompt, difficulty, form_title, form_link, editor_emails, quiz_data, settings
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (generation_id) DO NOTHING
+"""
+
+EXPORT_COLUMNS = (
+    "quiz_id, generation_id, date_created, created_by, source_hash, files_uploaded, "
+    "user_prompt, difficulty, form_title, form_link, editor_emails, quiz_data, settings"
+)
+
+
+def use_postgres():
+    return QUIZ_STORAGE_BACKEND == "postgres"
+
+
+def pg_conninfo():
+    """Connection string from the PG* environment variables used across the repo."""
+    return make_conninfo(
+        host=os.environ["PGHOST"],
+        dbname=os.environ["PGDATABASE"],
+        user=os.environ["PGUSER"],
+        password=os.environ["PGPASSWORD"],
+        sslmode=os.environ.get("PGSSLMODE", "require")
+    )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide connection pool, opened on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                pg_conninfo(),
+                min_size=PG_POOL_MIN_SIZE,
+                max_size=PG_POOL_MAX_SIZE,
+                name="quiz-results",
+                open=True
+            )
+        return _pool
+
+
+def create_schema(pool=None):
+    """Create or upgrade the quiz_results table and its indexes."""
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(statement)
+
+
+def drop_schema(pool=None):
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        conn.execute("DROP TABLE IF EXISTS quiz_results")
+
+
+def _row(doc):
+    editor_emails = doc.get("editor_emails") or []
+    return (
+        doc["generation_id"],
+        doc.get("date_created") or datetime.now(),
+        doc.get("created_by"),
+        doc.get("source_hash"),
+        doc.get("files_uploaded"),
+        Jsonb(doc.get("sources") or []),
+        doc.get("user_prompt"),
+        doc.get("difficulty"),
+        doc.get("form_title") or "",
+        doc.get("form_link") or "",
+        ",".join(editor_emails) if isinstance(editor_emails, list) else editor_emails,
+        Jsonb(doc.get("quiz_data") or {}),
+        Jsonb(doc.get("settings") or {})
+    )
+
+
+class PostgresQuizWriter:
+    """
+    Batched writer for the write-behind buffer; re-inserting a record is a no-op.
+
+    The pool and schema are set up on the first write, which runs on the
+    buffer's background thread, so an unreachable server never blocks a
+    request and its records are journaled like any other failed write.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self._schema_ready = False
+
+    def __call__(self, docs):
+        if self.pool is None:
+            self.pool = get_pool()
+        if not self._schema_ready:
+            create_schema(self.pool)
+            self._schema_ready = True
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(INSERT_SQL, [_row(doc) for doc in docs])
+
+
+def list_quizzes(email, cursor=None, page_size=20, pool=None):
+    """Keyset-paginated summaries of a user's quizzes, newest first, without quiz_data."""
+    pool = pool or get_pool()
+    query = """
+        SELECT quiz_id, generation_id, date_created, form_title, form_link, difficulty, files_uploaded
+        FROM quiz_results
+        WHERE created_by = %s
+    """
+    params = [email]
+    if cursor:
+        date_part, id_part = cursor.split("|", 1)
+        query += " AND (date_created, quiz_id) < (%s, %s)"
+        params.extend([datetime.fromisoformat(date_part), int(id_part)])
+    query += " ORDER BY date_created DESC, quiz_id DESC LIMIT %s"
+    params.append(page_size + 1)
+
+    with pool.connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            rows = cur.execute(query, params).fetchall()
+    next_cursor = None
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        next_cursor = f"{last['date_created'].isoformat()}|{last['quiz_id']}"
+    return rows[:page_size], next_cursor
+
+
+def iter_quizzes(email, pool=None):
+    """Yield (form_title, quiz_data) for a user's quizzes (all quizzes when email is None), newest first."""
+    pool = pool or get_pool()
+    query = "SELECT form_title, quiz_data FROM quiz_results"
+    params = []
+    if email:
+        query += " WHERE created_by = %s"
+        params.append(email)
+    query += " ORDER BY date_created DESC, quiz_id DESC"
+    with pool.connection() as conn:
+        # Server-side cursor, fetched in batches
+        with conn.cursor(name="quiz_results_lms_export") as cur:
+            cur.itersize = EXPORT_FETCH_SIZE
+            cur.execute(query, params)
+            for form_title, quiz_data in cur:
+                yield form_title, quiz_data or {}
+
+
+def export_quizzes(out, fmt="csv", pool=None):
+    """
+    Stream every quiz record to a binary file-like object.
+
+    CSV is produced by the server with COPY ... TO STDOUT and written chunk
+    by chunk. JSONL rows come from a server-side cursor fetched in batches.
+    Neither path holds the full table in memory.
+
+    Args:
+        out: Binary file-like object to write to
+        fmt (str): 'csv' or 'jsonl'
+        pool: Optional connection pool, defaults to the shared one
+
+    Returns:
+        int: Bytes written
+    """
+    pool = pool or get_pool()
+    written = 0
+    with pool.connection() as conn:
+        if fmt == "csv":
+            with conn.cursor() as cur:
+                copy_sql = f"COPY (SELECT {EXPORT_COLUMNS} FROM quiz_results ORDER BY quiz_id) TO STDOUT WITH (FORMAT csv, HEADER)"
+                with cur.copy(copy_sql) as copy:
+                    for chunk in copy:
+                        out.write(chunk)
+                        written += len(chunk)
+        elif fmt == "jsonl":
+            with conn.cursor(name="quiz_results_export", row_factory=dict_row) as cur:
+                cur.itersize = EXPORT_FETCH_SIZE
+                cur.execute(f"SELECT {EXPORT_COLUMNS} FROM quiz_results ORDER BY quiz_id")
+                for row in cur:
+                    line = (json.dumps(row, default=str) + "\n").encode("utf-8")
+                    out.write(line)
+                    written += len(line)
+        else:
+            raise ValueError(f"Unsupported export format: {fmt}")
+    return written
@@ -0,0 +1,241 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import streamlit as st
+
+from modules.artifact_store import current_session_id
+from modules.google_transport import transport_metrics
+
+# Profile every rerun of every session; otherwise only sessions opened with ?profile=<PROFILE_ADMIN_TOKEN>
+PROFILE_RERUNS = os.environ.get("PROFILE_RERUNS", "0").lower() in ("1", "true", "yes")
+# Secret for the ?profile= query parameter and the Profiles view; profiling by query parameter is off without it
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "quiz_profiles"))
+# Only the newest profiles are kept; older ones are deleted as new reruns are written
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "200"))
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.005
+TOP_FUNCTIONS = 10
+
+_active = threading.local()
+# cProfile can only be enabled once per process on newer Pythons, so concurrent reruns take turns
+_profile_lock = threading.Lock()
+_code_cache = {}
+
+
+def _admin_token_given():
+    return bool(PROFILE_ADMIN_TOKEN) and st.query_params.get("profile") == PROFILE_ADMIN_TOKEN
+
+
+def profiling_admin():
+    """True if reruns of this session are profiled and it may see the Profiles view."""
+    if _admin_token_given():
+        st.session_state.profiling_admin = True
+    return PROFILE_RERUNS or st.session_state.get("profiling_admin", False)
+
+
+def _compiled_script(path):
+    mtime = os.path.getmtime(path)
+    cached = _code_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding="utf-8") as f:
+        code = compile(f.read(), path, "exec")
+    _code_cache[path] = (mtime, code)
+    return code
+
+
+class StackSampler:
+    """Sample one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rerun-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Lines in the 'frame;frame;frame count' format read by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def top_functions(stats, script_path, limit=TOP_FUNCTIONS):
+    """The functions with the highest cumulative time, leaving out the script body itself."""
+    rows = []
+    for func, (_, calls, own, cumulative, _) in stats.stats.items():
+        if func[0] == script_path or func[2] in ("<built-in method builtins.exec>", "profile_rerun"):
+            continue
+        rows.append({
+            "function": _function_label(func),
+            "calls": calls,
+            "own_seconds": round(own, 4),
+            "cumulative_seconds": round(cumulative, 4)
+        })
+    rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+    return rows[:limit]
+
+
+def _rotate(directory, keep):
+    summaries = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in summaries[:max(0, len(summaries) - keep)]:
+        base = name[:-len(".json")]
+        for suffix in (".json", ".pstats", ".collapsed"):
+            try:
+                os.remove(os.path.join(directory, base + suffix))
+            except OSError:
+                pass
+
+
+def _save_profile(profile, sampler, script_path, seconds, outcome):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    session_id = current_session_id() or "nosession"
+    session_tag = "".join(char for char in session_id if char.isalnum())[:8]
+    base = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{session_tag}"
+    path = os.path.join(PROFILE_DIR, base)
+
+    stats = pstats.Stats(profile)
+    stats.dump_stats(f"{path}.pstats")
+    with open(f"{path}.collapsed", "w", encoding="utf-8") as f:
+        f.write(sampler.collapsed())
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "name": base,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "session_id": session_id,
+            "seconds": round(seconds, 4),
+            "outcome": outcome,
+            "top_functions": top_functions(stats, script_path)
+        }, f)
+    _rotate(PROFILE_DIR, PROFILE_KEEP)
+
+
+def profile_rerun(script_globals):
+    """
+    Run the rest of this rerun under cProfile and a stack sampler, if enabled.
+
+    Call at the very top of the Streamlit script with globals(). When
+    profiling is on for the session, the script is executed again inside the
+    profiler (the nested call returns False) and True is returned, so the
+    caller should stop. The profile is written even when the run ends with
+    st.stop() or st.rerun().
+
+    Returns:
+        bool: True if the rerun already ran under the profiler
+    """
+    if getattr(_active, "running", False):
+        return False
+    if not profiling_admin():
+        return False
+    if not _profile_lock.acquire(blocking=False):
+        return False
+
+    script_path = script_globals["__file__"]
+    code = _compiled_script(script_path)
+    profile = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident())
+    outcome = "completed"
+    _active.running = True
+    sampler.start()
+    started = time.perf_counter()
+    profile.enable()
+    try:
+        exec(code, script_globals)
+    except BaseException as e:
+        # st.stop() and st.rerun() end the script with control-flow exceptions
+        outcome = type(e).__name__
+        raise
+    finally:
+        profile.disable()
+        seconds = time.perf_counter() - started
+        sampler.stop()
+        _active.running = False
+        _profile_lock.release()
+        try:
+            _save_profile(profile, sampler, script_path, seconds, outcome)
+        except Exception as e:
+            print(f"⚠️ Could not save rerun profile: {e}")
+    return True
+
+
+def list_profiles(directory=PROFILE_DIR, limit=20):
+    """Summaries of the slowest saved reruns, slowest first."""
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                summaries.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    summaries.sort(key=lambda summary: summary["seconds"], reverse=True)
+    return summaries[:limit]
+
+
+def render_profiles_page():
+    """Admin view of the slowest profiled reruns with their top functions."""
+    st.subheader("⏱️ Rerun Profiles")
+    api_calls = transport_metrics()
+    if api_calls:
+        st.markdown("**Google API calls** (this process, latency buckets are cumulative)")
+        st.dataframe(api_calls)
+    st.caption(f"Profiles are written to {PROFILE_DIR} (newest {PROFILE_KEEP} kept).")
+    profiles = list_profiles()
+    if not profiles:
+        st.info("No profiled reruns yet.")
+        return
+
+    st.dataframe([
+        {
+            "Created": profile["created_at"],
+            "Seconds": profile["seconds"],
+            "Session": profile["session_id"][:8],
+            "Outcome": profile["outcome"],
+            "Top function": profile["top_functions"][0]["function"] if profile["top_functions"] else ""
+        }
+        for profile in profiles
+    ])
+    for profile in profiles:
+        with st.expander(f"{profile['seconds']:.3f}s · {profile['created_at']} · {profile['outcome']}"):
+            st.dataframe(profile["top_functions"])
+            base = os.path.join(PROFILE_DIR, profile["name"])
+            col_stats, col_stacks = st.columns(2)
+            for column, suffix, label in [(col_stats, ".pstats", "⬇️ pstats"), (col_stacks, ".collapsed", "⬇️ Collapsed stacks")]:
+                if os.path.exists(base + suffix):
+                    with open(base + suffix, "rb") as f:
+                        column.download_button(label, f.read(), file_name=profile["name"] + suffix, key=profile["name"] + suffix)
@@ -0,0 +1,217 @@
+import random
+from collections import defaultdict
+
+from pymongo import ASCENDING, UpdateOne
+
+from modules.forms_manager import normalize_mcq_answer
+from modules.quiz_storage import QUESTION_KINDS, STORAGE_VERSION, normalize_text, question_id
+from modules.text_compressor import extract_keywords
+
+# Questions found only by keyword must share this many keywords with the prompt; one is enough for prompts
+# with two keywords or fewer, so a single secondary word cannot rule out every match
+MIN_KEYWORD_OVERLAP = 2
+# Upper bound on candidates read per question kind; the indexes keep this a small range scan
+BANK_CANDIDATE_LIMIT = 500
+BANK_PROJECTION = {"kind": 1, "question": 1, "options": 1, "answer": 1, "keywords": 1, "source_hashes": 1}
+
+
+def ensure_indexes(db):
+    """Indexes for looking up bank questions by source and keyword. Safe to call repeatedly."""
+    db.questions.create_index([("kind", ASCENDING), ("source_hashes", ASCENDING)], name="kind_source_hashes")
+    db.questions.create_index([("kind", ASCENDING), ("keywords", ASCENDING)], name="kind_keywords")
+
+
+def backfill_index(db, batch_size=500):
+    """
+    Add the bank index fields to questions stored before they existed.
+
+    Source hashes and difficulties are copied from the quizzes that
+    reference each question, and missing keywords are computed. Can be
+    re-run safely.
+
+    Returns:
+        int: Number of quiz records scanned
+    """
+    scanned = 0
+    last_id = None
+    while True:
+        query = {"storage_version": STORAGE_VERSION}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        quizzes = list(db.quizzes.find(query, {"question_ids": 1, "source_hash": 1, "difficulty": 1}).sort("_id", 1).limit(batch_size))
+        if not quizzes:
+            break
+        last_id = quizzes[-1]["_id"]
+        scanned += len(quizzes)
+
+        updates = []
+        for quiz in quizzes:
+            added = {}
+            if quiz.get("source_hash"):
+                added["source_hashes"] = quiz["source_hash"]
+            if quiz.get("difficulty"):
+                added["difficulties"] = quiz["difficulty"]
+            if not added:
+                continue
+            for kind in QUESTION_KINDS:
+                for qid in quiz.get("question_ids", {}).get(kind, []):
+                    updates.append(UpdateOne({"_id": qid}, {"$addToSet": added}))
+        if updates:
+            db.questions.bulk_write(updates, ordered=False)
+
+    while True:
+        missing = list(db.questions.find({"keywords": {"$exists": False}}, {"question": 1, "answer": 1}).limit(batch_size))
+        if not missing:
+            break
+        db.questions.bulk_write([
+            UpdateOne({"_id": question["_id"]}, {"$set": {
+                "keywords": extract_keywords(f"{question.get('question', '')} {question.get('answer', '')}")
+            }})
+            for question in missing
+        ], ordered=False)
+    return scanned
+
+
+def _balanced_sample(candidates, wanted, source_hash, keywords, rng):
+    """
+    Pick up to `wanted` questions, questions from the same sources first.
+    Keyword-only matches must share at least MIN_KEYWORD_OVERLAP keywords
+    (one for short prompts).
+
+    Within each tier the candidates are grouped by the prompt keyword they
+    match (or their own main keyword) and taken round-robin across groups,
+    so one sub-topic cannot fill the whole quiz. Questions whose answer was
+    already picked are skipped.
+    """
+    keyword_set = set(keywords)
+    min_overlap = MIN_KEYWORD_OVERLAP if len(keyword_set) > 2 else 1
+    tiers = [defaultdict(list), defaultdict(list)]
+    for question in candidates:
+        overlap = [keyword for keyword in question.get("keywords", []) if keyword in keyword_set]
+        tier = 0 if source_hash and source_hash in question.get("source_hashes", []) else 1
+        if tier == 1 and len(overlap) < min_overlap:
+            continue
+        topic = overlap[0] if overlap else (question.get("keywords") or [""])[0]
+        tiers[tier][topic].append((-len(overlap), rng.random(), question))
+
+    picked = []
+    answers = set()
+    for groups in tiers:
+        queues = sorted((sorted(items, key=lambda item: item[:2]) for items in groups.values()), key=lambda items: items[0][:2])
+        while queues and len(picked) < wanted:
+            for queue in queues:
+                while queue:
+                    _, _, question = queue.pop(0)
+                    answer = normalize_text(question.get("answer"))
+                    if answer in answers:
+                        continue
+                    answers.add(answer)
+                    picked.append(question)
+                    break
+                if len(picked) >= wanted:
+                    break
+            queues = [queue for queue in queues if queue]
+    return picked
+
+
+def _distinct_options(question):
+    """The question's options, stripped and with repeats removed, in their original order."""
+    return list(dict.fromkeys(option.strip() for option in question["options"]))
+
+
+def _fit_options(question, num_options, rng):
+    """Keep the answer plus randomly chosen distractors so the MCQ has exactly num_options options."""
+    options = _distinct_options(question)
+    if len(options) == num_options:
+        return options
+    answer = normalize_mcq_answer(question["answer"], options)
+    distractors = [option for option in options if option != answer]
+    kept = set(rng.sample(distractors, num_options - 1)) | {answer}
+    return [option for option in options if option in kept]
+
+
+def assemble_from_bank(db, num_mcq, num_fill, num_options=4, difficulty=None, source_hash=None, prompt="", rng=None):
+    """
+    Build as much of a quiz as possible from previously stored questions.
+
+    Questions are matched by the content hash of the uploaded sources and
+    by keywords of the prompt, filtered to the requested difficulty, and
+    MCQs must have at least num_options options.
+
+    Args:
+        db: MongoDB database handle
+        num_mcq (int): Number of multiple choice questions wanted
+        num_fill (int): Number of fill-in-the-blank questions wanted
+        num_options (int): Options per MCQ
+        difficulty (str): Easy, Medium or Hard
+        source_hash (str): source_content_hash of the uploaded files
+        prompt (str): Educator prompt, used for keyword matching
+        rng (random.Random): Optional random source, for reproducible picks
+
+    Returns:
+        tuple: (quiz dict with 'mcq' and 'fill' lists, dict with the number
+            of 'mcq' and 'fill' questions still missing)
+    """
+    rng = rng or random.Random()
+    keywords = extract_keywords(prompt)
+    quiz = {"mcq": [], "fill": []}
+    wanted = {"mcq": num_mcq, "fill": num_fill}
+    if not source_hash and not keywords:
+        return quiz, wanted
+
+    for kind in QUESTION_KINDS:
+        if wanted[kind] <= 0:
+            continue
+        query = {"kind": kind}
+        if difficulty:
+            query["difficulties"] = difficulty
+        if kind == "mcq":
+            query[f"options.{num_options - 1}"] = {"$exists": True}
+        # Questions from the same uploads are read first, so keyword matches can never crowd them out
+        candidates = []
+        if source_hash:
+            candidates = list(db.questions.find({**query, "source_hashes": source_hash}, BANK_PROJECTION).limit(BANK_CANDIDATE_LIMIT))
+        if keywords and len(candidates) < BANK_CANDIDATE_LIMIT:
+            keyword_query = {**query, "keywords": {"$in": keywords}}
+            if source_hash:
+                keyword_query["source_hashes"] = {"$ne": source_hash}
+            remaining = BANK_CANDIDATE_LIMIT - len(candidates)
+            candidates += list(db.questions.find(keyword_query, BANK_PROJECTION).limit(remaining))
+        if kind == "mcq":
+            # Trimming options is only safe when the answer is known to be one of them
+            candidates = [
+                question for question in candidates
+                if len(_distinct_options(question)) >= num_options and normalize_mcq_answer(question["answer"], question["options"])
+            ]
+
+        for question in _balanced_sample(candidates, wanted[kind], source_hash, keywords, rng):
+            item = {"question": question["question"], "answer": question["answer"]}
+            if kind == "mcq":
+                item["options"] = _fit_options(question, num_options, rng)
+            quiz[kind].append(item)
+
+    shortfall = {kind: max(0, wanted[kind] - len(quiz[kind])) for kind in QUESTION_KINDS}
+    return quiz, shortfall
+
+
+def shortfall_prompt(prompt, bank_quiz):
+    """The educator prompt plus the bank questions already picked, so the model writes different ones."""
+    picked = [question["question"] for kind in QUESTION_KINDS for question in bank_quiz.get(kind, [])]
+    if not picked:
+        return prompt
+    listed = "\n".join(f"- {question}" for question in picked)
+    return f"{prompt}\n\nThese questions are already in the quiz, do not repeat or rephrase them:\n{listed}"
+
+
+def merge_generated(bank_quiz, generated):
+    """Bank questions followed by generated ones, dropping generated questions that duplicate a bank pick."""
+    quiz = {}
+    for kind in QUESTION_KINDS:
+        seen = {question_id(kind, question) for question in bank_quiz.get(kind, [])}
+        quiz[kind] = list(bank_quiz.get(kind, []))
+        for question in generated.get(kind, []):
+            qid = question_id(kind, question)
+            if qid not in seen:
+                seen.add(qid)
+                quiz[kind].append(question)
+    return quiz
@@ -1,9 +1,184 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 from langchain_core.prompts import PromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import JsonOutputParser
 
+# Model tiers: small quizzes go to the light model, everything else to the default one.
+# The fallback model is tried when an attempt fails or returns unparseable JSON.
+DEFAULT_MODEL = os.environ.get("QUIZ_MODEL", "gemini-2.5-flash")
+LIGHT_MODEL = os.environ.get("QUIZ_LIGHT_MODEL", "gemini-2.5-flash-lite")
+FALLBACK_MODEL = os.environ.get("QUIZ_FALLBACK_MODEL", "gemini-2.0-flash")
+SMALL_QUIZ_MAX_QUESTIONS = int(os.environ.get("SMALL_QUIZ_MAX_QUESTIONS", "5"))
+SMALL_QUIZ_MAX_CHARS = int(os.environ.get("SMALL_QUIZ_MAX_CHARS", "8000"))
+
+# Whole-request deadline and hedging: a duplicate attempt fires once the first one
+# has been running longer than the observed p95 latency of its model.
+GENERATION_DEADLINE_SECONDS = float(os.environ.get("QUIZ_DEADLINE_SECONDS", "90"))
+DEFAULT_HEDGE_DELAY_SECONDS = float(os.environ.get("QUIZ_HEDGE_DELAY_SECONDS", "20"))
+MIN_LATENCY_SAMPLES = 20
+# Model calls run on a pool shared by all sessions; a request can hold up to three
+# threads (primary, hedge, fallback), so size this to about 3x the concurrent sessions
+LLM_WORKERS = int(os.environ.get("QUIZ_LLM_WORKERS", "48"))
+# How often a queued primary attempt is checked for having started
+QUEUED_POLL_SECONDS = 0.05
+
+_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="quiz-llm")
+
+
+class LatencyTracker:
+    """Rolling per-model latency samples used to pick the hedge delay."""
+
+    def __init__(self, window=200):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._samples[model].append(seconds)
+
+    def percentile(self, model, pct):
+        with self._lock:
+            samples = sorted(self._samples[model])
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def hedge_delay(self, model):
+        with self._lock:
+            enough = len(self._samples[model]) >= MIN_LATENCY_SAMPLES
+        if not enough:
+            return DEFAULT_HEDGE_DELAY_SECONDS
+        return self.percentile(model, 95)
+
+
+latency_tracker = LatencyTracker()
+
+
+def select_models(topic, num_mcq, num_fill):
+    """Return the [primary, fallback] models for a request of this size."""
+    small = num_mcq + num_fill <= SMALL_QUIZ_MAX_QUESTIONS and len(topic or "") <= SMALL_QUIZ_MAX_CHARS
+    primary = LIGHT_MODEL if small else DEFAULT_MODEL
+    fallback = FALLBACK_MODEL if FALLBACK_MODEL != primary else DEFAULT_MODEL
+    return [primary, fallback]
+
+
+def build_chat_model(model, api_key, timeout=None):
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=api_key,
+        temperature=0.7,
+        timeout=timeout
+    )
+
+
+def _validate_quiz(result):
+    if not isinstance(result, dict):
+        raise ValueError("Model response is not a JSON object")
+    if not isinstance(result.get("mcq", []), list) or not isinstance(result.get("fill", []), list):
+        raise ValueError("Model response does not contain 'mcq' and 'fill' lists")
+    result.setdefault("mcq", [])
+    result.setdefault("fill", [])
+    return result
 
-def generate_quiz(topic, api_key, num_mcq=5, num_fill=2, difficulty="Medium"):
+
+def _run_attempt(prompt, parser, chat_model_factory, model, inputs, attempt):
+    started = time.monotonic()
+    attempt["started"] = started
+    chain = prompt | chat_model_factory(model) | parser
+    result = _validate_quiz(chain.invoke(inputs))
+    latency_tracker.record(model, time.monotonic() - started)
+    return result
+
+
+def route_generation(prompt, parser, chat_model_factory, models, inputs, deadline=None):
+    """
+    Run one generation with hedging, fallback and a deadline.
+
+    The primary model is called first. If it has not answered after running
+    for its p95 latency, a hedged duplicate is started and the first valid
+    JSON wins. Time spent waiting for a free worker does not count towards
+    the hedge delay.
+    If an attempt fails (API error or unparseable JSON) the fallback model is
+    started immediately.
+
+    Raises:
+        TimeoutError: if no valid quiz arrives before the deadline
+    """
+    deadline = GENERATION_DEADLINE_SECONDS if deadline is None else deadline
+    primary, fallback = models[0], models[-1]
+    expires_at = time.monotonic() + deadline
+    hedge_delay = latency_tracker.hedge_delay(primary)
+    primary_attempt = {"started": None}
+
+    def launch(model, attempt=None):
+        attempt = {"started": None} if attempt is None else attempt
+        return _executor.submit(_run_attempt, prompt, parser, chat_model_factory, model, inputs, attempt)
+
+    active = {launch(primary, primary_attempt)}
+    hedged = False
+    fallback_started = False
+    last_error = None
+
+    while True:
+        now = time.monotonic()
+        if now >= expires_at:
+            break
+        timeout = expires_at - now
+        hedge_at = None
+        if not hedged:
+            if primary_attempt["started"] is None:
+                # Still queued behind other sessions; the hedge clock has not started
+                timeout = min(timeout, QUEUED_POLL_SECONDS)
+            else:
+                hedge_at = primary_attempt["started"] + hedge_delay
+                timeout = min(timeout, max(hedge_at - now, 0))
+
+        done, active = wait(active, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            for other in active:
+                other.cancel()
+            return result
+
+        if done and last_error is not None and not fallback_started:
+            # The fallback doubles as the second attempt, so no hedge after it
+            active.add(launch(fallback))
+            fallback_started = hedged = True
+        elif not done and not hedged and hedge_at is not None and time.monotonic() >= hedge_at:
+            active.add(launch(primary))
+            hedged = True
+
+        if not active:
+            if not fallback_started:
+                active.add(launch(fallback))
+                fallback_started = True
+            else:
+                raise last_error
+
+    for future in active:
+        future.cancel()
+    raise TimeoutError(f"Quiz generation did not finish within {deadline:g} seconds") from last_error
+
+
+def generate_quiz(
+    topic,
+    api_key,
+    num_mcq=5,
+    num_fill=2,
+    difficulty="Medium",
+    chat_model_factory=None,
+    deadline=None
+):
     """
     Generate quiz questions using Google's Gemini AI.
     
@@ -13,6 +188,9 @@ def generate_quiz(topic, api_key, num_mcq=5, num_fill=2, difficulty="Medium"):
         num_mcq (int): Number of multiple choice questions
         num_fill (int): Number of fill-in-the-blank questions
         difficulty (str): Difficulty level (Easy, Medium, Hard)
+        chat_model_factory (callable): Optional function mapping a model name to
+            a LangChain chat model, e.g. a FakeListChatModel for local testing
+        deadline (float): Seconds to wait for a valid quiz before giving up
         
     Returns:
         dict: Generated quiz with 'mcq' and 'fill' question arrays
@@ -60,23 +238,23 @@ def generate_quiz(topic, api_key, num_mcq=5, num_fill=2, difficulty="Medium"):
         partial_variables={"format_instructions": parser.get_format_instructions()}
     )
 
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        google_api_key=api_key,
-        temperature=0.7
-    )
+    if chat_model_factory is None:
+        timeout = GENERATION_DEADLINE_SECONDS if deadline is None else deadline
+
+        def chat_model_factory(model):
+            return build_chat_model(model, api_key, timeout=timeout)
 
-    chain = prompt | llm | parser
+    models = select_models(topic, num_mcq, num_fill)
 
     # Accept num_options as an argument, default to 4 for backward compatibility
     def invoke_with_options(user_prompt, num_options=4):
-        return chain.invoke({
+        return route_generation(prompt, parser, chat_model_factory, models, {
             "topic": topic,
             "user_prompt": user_prompt,
             "num_mcq": num_mcq,
             "num_fill": num_fill,
             "difficulty": difficulty,
             "num_options": num_options
-        })
+        }, deadline=deadline)
 
     return invoke_with_options
@@ -0,0 +1,248 @@
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+
+import streamlit as st
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient
+
+from modules import pg_backend, question_bank
+from modules.lms_export import EXPORT_FORMAT_CHOICES, export_filename, export_mime, export_quizzes
+from modules.quiz_storage import expand_quiz_document, expand_quiz_documents
+
+# Fields needed by the history list view; quiz_data is deliberately left out
+LIST_PROJECTION = {
+    "generation_id": 1,
+    "date_created": 1,
+    "form_title": 1,
+    "form_link": 1,
+    "difficulty": 1,
+    "files_uploaded": 1
+}
+
+# Fields needed to export a quiz to an LMS format
+EXPORT_PROJECTION = {"form_title": 1, "quiz_data": 1, "question_ids": 1, "storage_version": 1}
+# Quiz records read and expanded per batch while exporting
+EXPORT_BATCH_SIZE = 200
+# Exports up to this size are built in memory, larger ones spill to an anonymous temporary file
+EXPORT_SPOOL_BYTES = 16 * 1024 * 1024
+# The in-app export is handed to the download button as bytes, so it is capped;
+# larger histories are exported with export_lms.py, which streams to a file
+HISTORY_EXPORT_MAX_MB = float(os.environ.get("HISTORY_EXPORT_MAX_MB", "50"))
+
+HISTORY_SORT = [("date_created", DESCENDING), ("_id", DESCENDING)]
+
+OWNER_FIELDS = {
+    "creator": "created_by",
+    "editor": "editor_emails"
+}
+
+
+def ensure_indexes(db):
+    """Create the indexes history queries rely on. Safe to call repeatedly."""
+    quizzes = db.quizzes
+    quizzes.create_index(
+        [("editor_emails", ASCENDING), ("date_created", DESCENDING), ("_id", DESCENDING)],
+        name="editor_emails_date_created"
+    )
+    quizzes.create_index(
+        [("created_by", ASCENDING), ("date_created", DESCENDING), ("_id", DESCENDING)],
+        name="created_by_date_created"
+    )
+    quizzes.create_index("generation_id", name="generation_id")
+    quizzes.create_index("source_hash", name="source_hash")
+
+
+@st.cache_resource
+def get_database(mongo_uri):
+    """Shared MongoDB handle; indexes are ensured once per process."""
+    client = MongoClient(mongo_uri)
+    db = client.get_database()
+    try:
+        ensure_indexes(db)
+        question_bank.ensure_indexes(db)
+    except Exception as e:
+        print(f"⚠️ Could not create quiz history indexes: {e}")
+    return db
+
+
+def source_content_hash(uploads):
+    """Order-independent hash of the uploaded sources, from artifact store metadata."""
+    digests = sorted(upload["sha256"] for upload in uploads or [] if upload.get("sha256"))
+    if not digests:
+        return None
+    return hashlib.sha256(",".join(digests).encode("utf-8")).hexdigest()
+
+
+def encode_cursor(doc):
+    return f"{doc['date_created'].isoformat()}|{doc['_id']}"
+
+
+def decode_cursor(cursor):
+    date_part, id_part = cursor.split("|", 1)
+    return datetime.fromisoformat(date_part), ObjectId(id_part)
+
+
+def list_quizzes(db, email, role="creator", cursor=None, page_size=20):
+    """
+    Return one page of a user's quizzes, newest first.
+
+    Pagination is keyset based on (date_created, _id), so every page is an
+    index range scan no matter how deep the user pages.
+
+    Args:
+        db: MongoDB database handle
+        email (str): Email of the user whose quizzes to list
+        role (str): 'creator' for quizzes the user generated, 'editor' for
+            quizzes shared with them
+        cursor (str): Opaque cursor returned with the previous page
+        page_size (int): Number of quizzes per page
+
+    Returns:
+        tuple: (list of quiz summaries, cursor for the next page or None)
+    """
+    query = {OWNER_FIELDS[role]: email}
+    if cursor:
+        date_created, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"date_created": {"$lt": date_created}},
+            {"date_created": date_created, "_id": {"$lt": last_id}}
+        ]
+
+    docs = list(db.quizzes.find(query, LIST_PROJECTION).sort(HISTORY_SORT).limit(page_size + 1))
+    next_cursor = encode_cursor(docs[page_size - 1]) if len(docs) > page_size else None
+    return docs[:page_size], next_cursor
+
+
+def get_quiz(db, generation_id):
+    """Load one full quiz document, including quiz_data."""
+    return expand_quiz_document(db, db.quizzes.find_one({"generation_id": generation_id}))
+
+
+def iter_user_quizzes(db, email, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield (form_title, quiz_data) for every quiz a user created (every quiz
+    when email is None), newest first.
+
+    Records are read with a streaming cursor and their questions are loaded
+    one batch at a time, so the whole history is never held in memory.
+    """
+    if pg_backend.use_postgres():
+        yield from pg_backend.iter_quizzes(email)
+        return
+    cursor = db.quizzes.find({"created_by": email} if email else {}, EXPORT_PROJECTION).sort(HISTORY_SORT).batch_size(batch_size)
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            for expanded in expand_quiz_documents(db, batch):
+                yield expanded.get("form_title"), expanded.get("quiz_data") or {}
+            batch = []
+    for expanded in expand_quiz_documents(db, batch):
+        yield expanded.get("form_title"), expanded.get("quiz_data") or {}
+
+
+def _within_size(quizzes, out, max_bytes, state):
+    """Pass quizzes through until the output has grown past max_bytes."""
+    for item in quizzes:
+        if out.tell() > max_bytes:
+            state["too_large"] = True
+            return
+        yield item
+
+
+def render_history_export(db, user_email):
+    """
+    Bulk export of all the user's quizzes to an LMS format, prepared on request.
+
+    The export is streamed into a spooled temporary file that is deleted as
+    soon as the download button has its bytes, so nothing is left on disk
+    and no path has to survive a rerun on another replica. The download
+    button keeps the whole file in memory, so exports larger than
+    HISTORY_EXPORT_MAX_MB are stopped and the user is pointed to the CLI.
+    """
+    with st.expander("⬇️ Export all my quizzes"):
+        label = st.selectbox("Format", list(EXPORT_FORMAT_CHOICES), key="history_export_format")
+        fmt = EXPORT_FORMAT_CHOICES[label]
+        zipped = fmt == "qti" or st.checkbox("Compress as zip", value=True, key="history_export_zip")
+        if not st.button("Prepare export"):
+            return
+        max_bytes = HISTORY_EXPORT_MAX_MB * 1024 * 1024
+        state = {"too_large": False}
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as spool:
+            try:
+                with st.spinner("Exporting quizzes..."):
+                    quizzes = _within_size(iter_user_quizzes(db, user_email), spool, max_bytes, state)
+                    counts = export_quizzes(quizzes, spool, fmt, zipped)
+            except Exception as e:
+                st.error(f"❌ Export failed: {e}")
+                return
+            if state["too_large"] or spool.tell() > max_bytes:
+                st.warning(
+                    f"⚠️ Your quiz history is larger than the {HISTORY_EXPORT_MAX_MB:g} MB in-app export limit. "
+                    f"Ask an administrator to run: python export_lms.py {fmt} {export_filename('my_quizzes', fmt, zipped)} "
+                    f"--user {user_email}{' --zip' if zipped and fmt != 'qti' else ''}"
+                )
+                return
+            spool.seek(0)
+            data = spool.read()
+
+        st.caption(f"{counts['quizzes']} quizzes, {counts['questions']} questions")
+        if counts["skipped"]:
+            st.warning(f"⚠️ {counts['skipped']} questions were left out because their answer matches no option.")
+        st.download_button(
+            f"⬇️ Download {label}",
+            data,
+            file_name=export_filename("my_quizzes", fmt, zipped),
+            mime=export_mime(fmt, zipped)
+        )
+
+
+def render_history_page(db, user_email, page_size=20):
+    """'My quizzes' view with previous/next paging. Returns the quizzes shown."""
+    st.subheader("📚 My Quizzes")
+    render_history_export(db, user_email)
+    role_label = st.radio("Show", ["Created by me", "Shared with me"], horizontal=True)
+    role = "creator" if role_label == "Created by me" else "editor"
+
+    if st.session_state.get("history_role") != role:
+        st.session_state.history_role = role
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.setdefault("history_cursors", [None])
+
+    try:
+        if pg_backend.use_postgres():
+            if role == "editor":
+                st.info("Shared quizzes are only listed with the MongoDB storage backend.")
+                return []
+            docs, next_cursor = pg_backend.list_quizzes(user_email, cursors[-1], page_size)
+        else:
+            docs, next_cursor = list_quizzes(db, user_email, role, cursors[-1], page_size)
+    except Exception as e:
+        st.error(f"❌ Could not load quiz history: {e}")
+        return []
+
+    if not docs:
+        st.info("No quizzes found yet.")
+
+    for doc in docs:
+        created = doc.get("date_created")
+        created_str = created.strftime("%Y-%m-%d %H:%M") if created else ""
+        st.markdown(f"**[{doc.get('form_title', 'Untitled quiz')}]({doc.get('form_link', '')})**")
+        details = [created_str, doc.get("difficulty", "")]
+        if doc.get("files_uploaded"):
+            details.append(f"Files: {doc['files_uploaded']}")
+        st.caption(" · ".join(detail for detail in details if detail))
+
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if len(cursors) > 1 and st.button("⬅️ Newer"):
+            cursors.pop()
+            st.rerun()
+    with col_next:
+        if next_cursor and st.button("Older ➡️"):
+            cursors.append(next_cursor)
+            st.rerun()
+
+    return docs
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import unicodedata
+import zlib
+from datetime import datetime
+
+from bson import Binary
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from modules.text_compressor import extract_keywords
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+STORAGE_VERSION = 2
+# Text fields at least this large are stored compressed
+COMPRESS_MIN_BYTES = int(os.environ.get("QUIZ_COMPRESS_MIN_BYTES", "2048"))
+# zstd when the zstandard package is installed, zlib otherwise; "none" disables compression
+QUIZ_COMPRESSION = os.environ.get("QUIZ_COMPRESSION", "zstd" if zstandard else "zlib")
+
+DUPLICATE_KEY_ERROR = 11000
+QUESTION_KINDS = ("mcq", "fill")
+
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFKC", str(text or "")).casefold().split())
+
+
+def question_id(kind, question):
+    """Content address of a question: hash of its normalized text, options and answer."""
+    parts = [kind, normalize_text(question.get("question"))]
+    parts.extend(sorted(normalize_text(option) for option in question.get("options", [])))
+    parts.append(normalize_text(question.get("answer")))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def compress_text(text):
+    """Compress a large text field; small values are returned unchanged."""
+    if not isinstance(text, str) or QUIZ_COMPRESSION == "none":
+        return text
+    raw = text.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return text
+    if QUIZ_COMPRESSION == "zstd" and zstandard:
+        return {"codec": "zstd", "data": Binary(zstandard.ZstdCompressor(level=10).compress(raw))}
+    return {"codec": "zlib", "data": Binary(zlib.compress(raw, 9))}
+
+
+def decompress_text(value):
+    if not isinstance(value, dict) or "codec" not in value:
+        return value
+    if value["codec"] == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this quiz record")
+        raw = zstandard.ZstdDecompressor().decompress(bytes(value["data"]))
+    else:
+        raw = zlib.decompress(bytes(value["data"]))
+    return raw.decode("utf-8")
+
+
+def compact_quiz_document(doc):
+    """
+    Split a full quiz document into a compact quiz record and its questions.
+
+    Returns:
+        tuple: (compact quiz document, list of question documents)
+    """
+    quiz_data = doc.get("quiz_data") or {}
+    question_docs = {}
+    question_ids = {}
+    for kind in QUESTION_KINDS:
+        question_ids[kind] = []
+        for question in quiz_data.get(kind, []):
+            qid = question_id(kind, question)
+            question_ids[kind].append(qid)
+            question_docs[qid] = {
+                "_id": qid,
+                "kind": kind,
+                "question": question.get("question", ""),
+                "options": list(question.get("options", [])) if kind == "mcq" else [],
+                "answer": question.get("answer", ""),
+                "keywords": extract_keywords(f"{question.get('question', '')} {question.get('answer', '')}"),
+                # Question bank index: every source and difficulty the question was generated for
+                "source_hashes": [doc["source_hash"]] if doc.get("source_hash") else [],
+                "difficulties": [doc["difficulty"]] if doc.get("difficulty") else []
+            }
+
+    compact = {key: value for key, value in doc.items() if key != "quiz_data"}
+    compact["question_ids"] = question_ids
+    compact["user_prompt"] = compress_text(doc.get("user_prompt"))
+    compact["storage_version"] = STORAGE_VERSION
+    return compact, list(question_docs.values())
+
+
+def _question_ids(doc):
+    question_ids = doc.get("question_ids", {})
+    return [qid for kind in QUESTION_KINDS for qid in question_ids.get(kind, [])]
+
+
+def expand_quiz_document(db, doc):
+    """Rebuild the original quiz_data and text fields of a stored quiz document."""
+    if not doc or doc.get("storage_version") != STORAGE_VERSION:
+        return doc
+    questions = {q["_id"]: q for q in db.questions.find({"_id": {"$in": _question_ids(doc)}})}
+    return _expand(doc, questions)
+
+
+def expand_quiz_documents(db, docs):
+    """expand_quiz_document for a batch, with one questions query for all of them."""
+    wanted = {qid for doc in docs if doc.get("storage_version") == STORAGE_VERSION for qid in _question_ids(doc)}
+    questions = {q["_id"]: q for q in db.questions.find({"_id": {"$in": list(wanted)}})} if wanted else {}
+    return [_expand(doc, questions) if doc.get("storage_version") == STORAGE_VERSION else doc for doc in docs]
+
+
+def _expand(doc, questions):
+    expanded = dict(doc)
+    expanded["user_prompt"] = decompress_text(doc.get("user_prompt"))
+    question_ids = doc.get("question_ids", {})
+    quiz_data = {}
+    for kind in QUESTION_KINDS:
+        quiz_data[kind] = []
+        for qid in question_ids.get(kind, []):
+            question = questions.get(qid)
+            if not question:
+                continue
+            item = {"question": question["question"], "answer": question["answer"]}
+            if kind == "mcq":
+                item["options"] = question["options"]
+            quiz_data[kind].append(item)
+    expanded["quiz_data"] = quiz_data
+    return expanded
+
+
+INDEX_FIELDS = ("source_hashes", "difficulties")
+
+
+def _merge_question_docs(question_docs, questions):
+    """Add questions to a dict keyed by id, combining the index fields of duplicates."""
+    for question in questions:
+        existing = question_docs.get(question["_id"])
+        if existing is None:
+            question_docs[question["_id"]] = question
+            continue
+        for field in INDEX_FIELDS:
+            existing[field] = sorted(set(existing.get(field, [])) | set(question.get(field, [])))
+
+
+def _upsert_questions(db, question_docs, now):
+    if not question_docs:
+        return
+    db.questions.bulk_write([
+        UpdateOne(
+            {"_id": question["_id"]},
+            {
+                "$setOnInsert": {
+                    **{key: value for key, value in question.items() if key not in INDEX_FIELDS},
+                    "first_seen": now
+                },
+                "$addToSet": {field: {"$each": question.get(field, [])} for field in INDEX_FIELDS}
+            },
+            upsert=True
+        )
+        for question in question_docs
+    ], ordered=False)
+
+
+def store_quiz_documents(db, docs):
+    """Store full quiz documents in the compact layout with bulk writes."""
+    compact_docs = []
+    question_docs = {}
+    for doc in docs:
+        compact, questions = compact_quiz_document(doc)
+        compact_docs.append(compact)
+        _merge_question_docs(question_docs, questions)
+
+    _upsert_questions(db, list(question_docs.values()), datetime.now())
+    try:
+        db.quizzes.insert_many(compact_docs, ordered=False)
+    except BulkWriteError as e:
+        # Replayed documents keep their _id, so already stored ones are not an error
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+
+
+def migrate_quizzes(db, batch_size=500):
+    """
+    Convert quiz documents written in the old layout to the compact one.
+
+    Documents are processed in _id order in bulk batches and can be re-run
+    safely; already migrated documents are skipped.
+
+    Returns:
+        int: Number of migrated documents
+    """
+    migrated = 0
+    query = {"storage_version": {"$ne": STORAGE_VERSION}}
+    last_id = None
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        docs = list(db.quizzes.find(batch_query).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        replacements = []
+        question_docs = {}
+        for doc in docs:
+            compact, questions = compact_quiz_document(doc)
+            if not compact.get("sources") and doc.get("files_uploaded"):
+                # Content hashes are unknown for old records; keep the names at least
+                compact["sources"] = [{"name": name} for name in doc["files_uploaded"].split(",") if name]
+            replacements.append(ReplaceOne({"_id": doc["_id"]}, compact))
+            _merge_question_docs(question_docs, questions)
+
+        _upsert_questions(db, list(question_docs.values()), datetime.now())
+        db.quizzes.bulk_write(replacements, ordered=False)
+        migrated += len(replacements)
+    return migrated
@@ -0,0 +1,286 @@
+import re
+from datetime import datetime
+
+import numpy as np
+import streamlit as st
+from pymongo import ASCENDING, ReplaceOne
+
+from modules.answer_matcher import AnswerMatcher
+from modules.forms_manager import normalize_mcq_answer
+
+# Maximum page size accepted by forms.responses.list
+RESPONSES_PAGE_SIZE = 5000
+# Share of students in the upper and lower groups for the discrimination index
+DISCRIMINATION_GROUP = 0.27
+
+FORM_ID_RE = re.compile(r"/forms/d/([^/]+)")
+
+
+def form_id_from_link(form_link):
+    match = FORM_ID_RE.search(form_link or "")
+    return match.group(1) if match else None
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def ensure_indexes(db):
+    db.form_responses.create_index([("form_id", ASCENDING), ("last_submitted_time", ASCENDING)], name="form_id_submitted")
+
+
+def sync_responses(db, forms_service, form_id):
+    """
+    Pull new and edited responses for a form into the form_responses collection.
+
+    Only responses submitted since the last sync are requested. Progress is
+    saved after every page (last submitted time and page token), so an
+    interrupted sync continues where it stopped.
+
+    Args:
+        db: MongoDB database handle
+        forms_service: Google Forms API service object
+        form_id (str): Form to sync
+
+    Returns:
+        int: Number of responses fetched
+    """
+    state = db.response_sync.find_one({"_id": form_id}) or {}
+    since = state.get("in_progress_since", state.get("last_submitted_time"))
+    page_token = state.get("page_token")
+    newest = state.get("in_progress_newest", since)
+    fetched = 0
+
+    while True:
+        request = {"formId": form_id, "pageSize": RESPONSES_PAGE_SIZE}
+        if since:
+            # >= rather than > so responses sharing the last timestamp are not skipped; upserts dedupe
+            request["filter"] = f"timestamp >= {since}"
+        if page_token:
+            request["pageToken"] = page_token
+        page = forms_service.forms().responses().list(**request).execute()
+
+        responses = page.get("responses", [])
+        if responses:
+            db.form_responses.bulk_write([
+                ReplaceOne(
+                    {"_id": response["responseId"]},
+                    {
+                        "_id": response["responseId"],
+                        "form_id": form_id,
+                        "last_submitted_time": response.get("lastSubmittedTime"),
+                        "answers": response.get("answers", {})
+                    },
+                    upsert=True
+                )
+                for response in responses
+            ], ordered=False)
+            fetched += len(responses)
+            for response in responses:
+                submitted = response.get("lastSubmittedTime")
+                if submitted and (not newest or _parse_timestamp(submitted) > _parse_timestamp(newest)):
+                    newest = submitted
+
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            break
+        db.response_sync.update_one({"_id": form_id}, {"$set": {
+            "in_progress_since": since,
+            "in_progress_newest": newest,
+            "page_token": page_token
+        }}, upsert=True)
+
+    db.response_sync.update_one({"_id": form_id}, {
+        "$set": {"last_submitted_time": newest, "synced_at": datetime.now()},
+        "$unset": {"in_progress_since": "", "in_progress_newest": "", "page_token": ""}
+    }, upsert=True)
+    return fetched
+
+
+def build_answer_key(forms_service, form_id):
+    """
+    Read the graded questions of a form.
+
+    Returns:
+        list: One dict per graded question with question_id, title, kind
+            ('mcq' or 'fill'), options, correct answers and points
+    """
+    form = forms_service.forms().get(formId=form_id).execute()
+    key = []
+    for item in form.get("items", []):
+        question = item.get("questionItem", {}).get("question", {})
+        grading = question.get("grading")
+        if not grading:
+            continue
+        choice = question.get("choiceQuestion")
+        key.append({
+            "question_id": question["questionId"],
+            "title": item.get("title", ""),
+            "kind": "mcq" if choice else "fill",
+            "options": [option.get("value", "") for option in (choice or {}).get("options", [])],
+            "correct": [answer.get("value", "") for answer in grading.get("correctAnswers", {}).get("answers", [])],
+            "points": grading.get("pointValue", 1)
+        })
+    return key
+
+
+def _first_answer(response, question_id):
+    text_answers = response.get("answers", {}).get(question_id, {}).get("textAnswers", {})
+    answers = text_answers.get("answers", [])
+    return answers[0].get("value", "") if answers else ""
+
+
+def _mcq_correct(question, value):
+    if not value:
+        return False
+    chosen = normalize_mcq_answer(value, question["options"])
+    return any(chosen and chosen == normalize_mcq_answer(correct, question["options"]) for correct in question["correct"])
+
+
+def answer_matrix(answer_key, responses, matcher=None):
+    """
+    Build a students x questions boolean matrix of correct answers.
+
+    Each distinct answer string is graded once per question and broadcast
+    back with NumPy, so cost grows with the number of distinct answers
+    rather than the number of students. Fill-in-the-blank answers are
+    compared in canonical form with an AnswerMatcher.
+    """
+    matcher = matcher or AnswerMatcher()
+    matrix = np.zeros((len(responses), len(answer_key)), dtype=bool)
+    for column, question in enumerate(answer_key):
+        values = np.array([_first_answer(response, question["question_id"]) for response in responses], dtype=object)
+        if not len(values):
+            continue
+        distinct, inverse = np.unique(values.astype(str), return_inverse=True)
+        if question["kind"] == "mcq":
+            graded = (_mcq_correct(question, value) for value in distinct)
+        else:
+            key = matcher.compile_key(question["correct"])
+            graded = (matcher.matches(key, value) for value in distinct)
+        matrix[:, column] = np.fromiter(graded, dtype=bool, count=len(distinct))[inverse]
+    return matrix
+
+
+def item_analysis(matrix, points):
+    """
+    Classical item statistics for a students x questions correctness matrix.
+
+    Returns:
+        dict: 'difficulty' (share correct per item), 'discrimination'
+            (upper minus lower 27% group share correct) and 'point_biserial'
+            (correlation of each item with the score on the other items)
+    """
+    students, items = matrix.shape
+    scored = matrix.astype(float)
+    if students == 0:
+        empty = np.zeros(items)
+        return {"difficulty": empty, "discrimination": empty, "point_biserial": empty}
+
+    difficulty = scored.mean(axis=0)
+    totals = scored @ points
+
+    group = max(1, int(round(students * DISCRIMINATION_GROUP)))
+    order = np.argsort(totals, kind="stable")
+    discrimination = scored[order[-group:]].mean(axis=0) - scored[order[:group]].mean(axis=0)
+
+    # Item-rest correlation: leave the item itself out of the total
+    rest = totals[:, None] - scored * points
+    item_centered = scored - difficulty
+    rest_centered = rest - rest.mean(axis=0)
+    denominator = np.sqrt((item_centered ** 2).sum(axis=0) * (rest_centered ** 2).sum(axis=0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        point_biserial = np.where(denominator > 0, (item_centered * rest_centered).sum(axis=0) / denominator, 0.0)
+
+    return {"difficulty": difficulty, "discrimination": discrimination, "point_biserial": point_biserial}
+
+
+def _grade(answer_key, responses, matcher=None):
+    matrix = answer_matrix(answer_key, responses, matcher)
+    points = np.array([question["points"] for question in answer_key], dtype=float)
+    stats = item_analysis(matrix, points)
+    return {
+        "answer_key": answer_key,
+        "response_ids": [response["_id"] for response in responses],
+        "scores": matrix.astype(float) @ points,
+        "max_score": float(points.sum()),
+        **stats
+    }
+
+
+def score_form(db, forms_service, form_id, sync=True, matcher=None):
+    """
+    Sync responses for a form and grade them locally.
+
+    The answer key is saved with the sync state so the form can later be
+    regraded offline with regrade_form.
+
+    Returns:
+        dict: 'answer_key', 'response_ids', 'scores', 'max_score' and the
+            item statistics from item_analysis
+    """
+    if sync:
+        sync_responses(db, forms_service, form_id)
+    answer_key = build_answer_key(forms_service, form_id)
+    db.response_sync.update_one({"_id": form_id}, {"$set": {"answer_key": answer_key}}, upsert=True)
+    responses = list(db.form_responses.find({"form_id": form_id}, {"answers": 1}))
+    return _grade(answer_key, responses, matcher)
+
+
+def regrade_form(db, form_id, synonyms=None, ignore_articles=False):
+    """
+    Regrade already ingested responses without calling the Forms API.
+
+    Args:
+        db: MongoDB database handle
+        form_id (str): Previously scored form
+        synonyms (dict): Extra accepted answers, see AnswerMatcher
+        ignore_articles (bool): Ignore 'a', 'an' and 'the' in answers
+
+    Returns:
+        dict: Same shape as score_form, or None if the form was never scored
+    """
+    state = db.response_sync.find_one({"_id": form_id}, {"answer_key": 1})
+    if not state or "answer_key" not in state:
+        return None
+    responses = list(db.form_responses.find({"form_id": form_id}, {"answers": 1}))
+    return _grade(state["answer_key"], responses, AnswerMatcher(synonyms, ignore_articles))
+
+
+def render_results_panel(db, quizzes, forms_service_factory):
+    """Pick a quiz from the current history page and show its graded results."""
+    linked = [quiz for quiz in quizzes if form_id_from_link(quiz.get("form_link"))]
+    if not linked:
+        return
+    st.markdown("---")
+    st.subheader("📊 Results")
+    labels = [f"{quiz.get('form_title', 'Untitled quiz')} ({quiz.get('date_created', '')})" for quiz in linked]
+    choice = st.selectbox("Quiz", range(len(linked)), format_func=lambda index: labels[index])
+    if not st.button("🔄 Sync & score responses"):
+        return
+
+    form_id = form_id_from_link(linked[choice]["form_link"])
+    try:
+        ensure_indexes(db)
+        results = score_form(db, forms_service_factory()["forms"], form_id)
+    except Exception as e:
+        st.error(f"❌ Could not load responses: {e}")
+        st.info("💡 If this is a permissions error, log out and log in again to grant access to form responses.")
+        return
+
+    if not len(results["scores"]):
+        st.info("No responses yet.")
+        return
+    st.write(
+        f"Responses: {len(results['scores'])} · "
+        f"Average score: {results['scores'].mean():.2f} / {results['max_score']:.0f}"
+    )
+    st.dataframe([
+        {
+            "Question": question["title"],
+            "Difficulty (share correct)": round(float(results["difficulty"][i]), 2),
+            "Discrimination": round(float(results["discrimination"][i]), 2),
+            "Point-biserial": round(float(results["point_biserial"][i]), 2)
+        }
+        for i, question in enumerate(results["answer_key"])
+    ])
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import Binary
+from pymongo import MongoClient
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# "local" (default) keeps state in this process and on local disk; "mongo" or "redis"
+# share credentials, drafts and cached artifacts so any replica can serve any request
+SHARED_STATE_BACKEND = os.environ.get("SHARED_STATE_BACKEND", "local").strip().lower()
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+# How long an untouched draft survives in the shared backend
+SHARED_DRAFT_TTL_SECONDS = int(os.environ.get("SHARED_DRAFT_TTL_SECONDS", str(7 * 24 * 3600)))
+# How long cached uploads and extracted text survive in the shared backend
+SHARED_ARTIFACT_TTL_SECONDS = int(os.environ.get("SHARED_ARTIFACT_TTL_SECONDS", str(24 * 3600)))
+# Larger artifacts stay replica-local; MongoDB documents are capped at 16 MB
+SHARED_ARTIFACT_MAX_BYTES = 8 * 1024 * 1024
+
+# Session state keys that make up a draft and are restored on whichever replica serves the user
+DRAFT_STATE_KEYS = (
+    "draft_quiz",
+    "draft_inputs",
+    "draft_form_link",
+    "draft_ready",
+    "draft_created",
+    "publish_checkpoint",
+    "notification_sent"
+)
+
+
+class MongoSharedState:
+    """Key/value state in a MongoDB collection; a TTL index removes expired entries."""
+
+    def __init__(self, mongo_uri, collection="shared_state"):
+        self.collection = MongoClient(mongo_uri).get_database()[collection]
+        self.collection.create_index("expires_at", expireAfterSeconds=0, name="expires_at_ttl")
+
+    def get(self, key):
+        doc = self.collection.find_one({"_id": key})
+        if not doc:
+            return None
+        # The TTL monitor only runs once a minute, so check expiry here as well
+        expires_at = doc.get("expires_at")
+        if expires_at and expires_at.replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+            return None
+        return bytes(doc["value"])
+
+    def set(self, key, value, ttl=None):
+        doc = {"value": Binary(value), "updated_at": datetime.now(timezone.utc)}
+        doc["expires_at"] = datetime.now(timezone.utc) + timedelta(seconds=ttl) if ttl else None
+        self.collection.update_one({"_id": key}, {"$set": doc}, upsert=True)
+
+    def delete(self, key):
+        self.collection.delete_one({"_id": key})
+
+
+class RedisSharedState:
+    """Key/value state in Redis."""
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("SHARED_STATE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+
+def shared_state_enabled():
+    return SHARED_STATE_BACKEND in ("mongo", "redis")
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state():
+    """Process-wide shared state backend, or None in the default local mode."""
+    global _state
+    if not shared_state_enabled():
+        return None
+    with _state_lock:
+        if _state is None:
+            if SHARED_STATE_BACKEND == "redis":
+                _state = RedisSharedState(REDIS_URL)
+            else:
+                _state = MongoSharedState(os.environ.get("MONGO_URI"))
+        return _state
+
+
+def _draft_key(user_key):
+    return f"draft:{user_key}"
+
+
+def save_draft_state(session_state, user_key):
+    """
+    Copy the draft keys of a session to the shared backend.
+
+    Does nothing in local mode, where session state is the only copy.
+    """
+    state = get_shared_state()
+    if state is None or not user_key:
+        return
+    draft = {key: session_state[key] for key in DRAFT_STATE_KEYS if key in session_state}
+    try:
+        if draft:
+            payload = json.dumps({"saved_at": time.time(), "state": draft}, default=str)
+            state.set(_draft_key(user_key), payload.encode("utf-8"), SHARED_DRAFT_TTL_SECONDS)
+        else:
+            state.delete(_draft_key(user_key))
+    except Exception as e:
+        print(f"⚠️ Could not save draft to shared state: {e}")
+
+
+def restore_draft_state(session_state, user_key):
+    """
+    Load a user's draft into a fresh session, e.g. after the load balancer
+    moved them to another replica. Sessions that already hold a draft are
+    left alone.
+    """
+    state = get_shared_state()
+    if state is None or not user_key or session_state.get("draft_restored"):
+        return
+    session_state["draft_restored"] = True
+    if any(key in session_state for key in DRAFT_STATE_KEYS):
+        return
+    try:
+        payload = state.get(_draft_key(user_key))
+    except Exception as e:
+        print(f"⚠️ Could not load draft from shared state: {e}")
+        return
+    if payload:
+        for key, value in json.loads(payload)["state"].items():
+            session_state[key] = value
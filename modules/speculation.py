@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Off by default: speculative runs spend LLM tokens on drafts the user may never request
+SPECULATIVE_GENERATION = os.environ.get("SPECULATIVE_GENERATION", "0").lower() in ("1", "true", "yes")
+# Inputs must stay unchanged this long before a speculative run starts
+SPECULATION_DEBOUNCE_SECONDS = float(os.environ.get("SPECULATION_DEBOUNCE_SECONDS", "3"))
+# Estimated tokens each user may spend on speculative runs per rolling hour
+SPECULATIVE_TOKENS_PER_HOUR = int(os.environ.get("SPECULATIVE_TOKENS_PER_HOUR", "200000"))
+# Allowance for the generated quiz on top of the prompt itself
+OUTPUT_TOKEN_ESTIMATE = 2000
+# Unclaimed results of sessions that went away are dropped after this long
+SPECULATION_RESULT_TTL_SECONDS = 600
+# Fingerprints of inputs whose draft was already taken are kept until the inputs change; this
+# only bounds the entries of sessions that went away, well past any idle reruns
+CONSUMED_KEY_TTL_SECONDS = 24 * 3600
+
+
+def speculation_key(**inputs):
+    """Hash of the exact generation inputs; a speculative result is only reused on an identical key."""
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SpendLimiter:
+    """Rolling one-hour token budget per user."""
+
+    def __init__(self, tokens_per_hour):
+        self.tokens_per_hour = tokens_per_hour
+        self._spent = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def try_spend(self, user_key, tokens):
+        now = time.monotonic()
+        with self._lock:
+            spent = self._spent[user_key]
+            while spent and now - spent[0][0] > 3600:
+                spent.popleft()
+            if sum(amount for _, amount in spent) + tokens > self.tokens_per_hour:
+                return False
+            spent.append((now, tokens))
+            return True
+
+
+class SpeculativeGenerator:
+    """
+    Start quiz generation in the background once a session's inputs settle.
+
+    Every rerun reports the session's current input key. A job is only
+    submitted after the key has stayed the same for the debounce period, and
+    a newer key cancels or discards the previous job. When the user clicks
+    Generate, take() hands back the result if it was computed for exactly
+    the same inputs.
+    """
+
+    def __init__(self, debounce_seconds, tokens_per_hour, max_workers=2):
+        self.debounce_seconds = debounce_seconds
+        self.limiter = SpendLimiter(tokens_per_hour)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-quiz")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, session_id, user_key, key, prepare, generate):
+        """
+        Register the session's current inputs.
+
+        Args:
+            session_id (str): Streamlit session id
+            user_key (str): User the spend cap applies to
+            key (str): speculation_key of the current inputs
+            prepare (callable): Returns (file_topic, estimated prompt tokens)
+            generate (callable): Takes file_topic and returns the quiz
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(session_id)
+            if job and job["key"] == key:
+                return
+            if job:
+                self._discard(job)
+            job = {"key": key, "future": None, "timer": None, "created": time.monotonic(), "consumed": False}
+            job["timer"] = threading.Timer(self.debounce_seconds, self._start, (session_id, job, user_key, prepare, generate))
+            job["timer"].daemon = True
+            self._jobs[session_id] = job
+            job["timer"].start()
+
+    def _start(self, session_id, job, user_key, prepare, generate):
+        with self._lock:
+            if self._jobs.get(session_id) is not job:
+                return
+            job["future"] = self._executor.submit(self._run, user_key, prepare, generate)
+
+    def _run(self, user_key, prepare, generate):
+        file_topic, prompt_tokens = prepare()
+        if not self.limiter.try_spend(user_key, prompt_tokens + OUTPUT_TOKEN_ESTIMATE):
+            return None
+        return file_topic, generate(file_topic)
+
+    def _prune(self):
+        now = time.monotonic()
+        for session_id, job in list(self._jobs.items()):
+            ttl = CONSUMED_KEY_TTL_SECONDS if job["consumed"] else SPECULATION_RESULT_TTL_SECONDS
+            if now - job["created"] > ttl:
+                self._discard(job)
+                del self._jobs[session_id]
+
+    def _discard(self, job):
+        if job["timer"]:
+            job["timer"].cancel()
+        if job["future"]:
+            # A run that already started cannot be interrupted; its result is simply dropped
+            job["future"].cancel()
+
+    def take(self, session_id, key):
+        """
+        Return (file_topic, quiz) for these inputs, or None if there is no usable run.
+
+        A matching run that is still in flight is waited for, since it is
+        already ahead of a fresh request.
+        """
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+            if key:
+                # Placeholder so the same inputs are not speculated on again after being used
+                self._jobs[session_id] = {"key": key, "future": None, "timer": None, "created": time.monotonic(), "consumed": True}
+        if not job:
+            return None
+        if job["key"] != key or job["future"] is None:
+            self._discard(job)
+            return None
+        try:
+            return job["future"].result()
+        except Exception as e:
+            print(f"⚠️ Speculative generation failed, generating normally: {e}")
+            return None
+
+
+@st.cache_resource
+def get_speculator():
+    """Process-wide speculative generator configured from the SPECULATION_* settings."""
+    return SpeculativeGenerator(SPECULATION_DEBOUNCE_SECONDS, SPECULATIVE_TOKENS_PER_HOUR)
@@ -0,0 +1,288 @@
+import os
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+# Rough prompt budget for the source material, in tokens (about 4 characters each)
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "8000"))
+
+SECTION_RE = re.compile(r"^\[SECTION (\d+) OF (\d+)\]$", re.MULTILINE)
+SOURCE_HEADER_RE = re.compile(r"^\s*={10,}\nSOURCE FILE \d+: .*\n={10,}\n")
+PAGE_NUMBER_RE = re.compile(r"^(page\s*)?\d+(\s*(of|/)\s*\d+)?$", re.IGNORECASE)
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+HASH_BUCKETS = 2048
+# Running headers, footers and page numbers are only looked for in this many lines at the top and bottom of a page
+PAGE_EDGE_LINES = 3
+MAX_SENTENCE_WORDS = 60
+TEXTRANK_MAX_SENTENCES = 1500
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+# Words common to question and prompt phrasing that say nothing about the topic
+QUESTION_WORDS = frozenset(
+    "about also answer best does following generate into make many most quiz question questions statement true "
+    "what when where which while whom whose with would "
+    "chapter class course grade lesson level lessons module school student students topic topics unit year".split()
+)
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def extract_keywords(text, limit=12):
+    """Most frequent content words of a text, used to index and look up stored questions."""
+    counts = Counter(
+        word for word in WORD_RE.findall((text or "").lower())
+        if len(word) > 3 and not word.isdigit() and word not in STOPWORDS and word not in QUESTION_WORDS
+    )
+    return [word for word, _ in counts.most_common(limit)]
+
+
+def normalize_whitespace(text):
+    """Collapse runs of spaces, strip lines and keep at most one blank line between paragraphs."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\u00a0", " ")
+    lines = [re.sub(r"[ \t\f\v]+", " ", line).strip() for line in text.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _line_signature(line):
+    # Exact text up to case and spacing; bare page numbers are matched by PAGE_NUMBER_RE instead,
+    # since ignoring digits would also match numbered body lines ('Step 1 ...', 'The answer is 42')
+    return " ".join(line.lower().split())
+
+
+def _edge_lines(lines):
+    """
+    Indexes of the first and last PAGE_EDGE_LINES non-blank lines of a page.
+
+    Pages too short to have a body between the two bands (slides,
+    worksheets) have no edge lines, so none of their text is stripped.
+    """
+    nonblank = [index for index, line in enumerate(lines) if line.strip()]
+    if len(nonblank) <= 2 * PAGE_EDGE_LINES:
+        return set()
+    return set(nonblank[:PAGE_EDGE_LINES] + nonblank[-PAGE_EDGE_LINES:])
+
+
+def strip_repeated_lines(pages, min_fraction=0.5):
+    """
+    Remove running headers, footers and page numbers from extracted PDF pages.
+
+    Only lines near the top or bottom of a page are candidates, so numeric
+    answers and repeated table rows in the body are kept. Short pages are
+    left as they are and do not count towards the threshold.
+
+    Args:
+        pages (list): Text of each page, in order
+        min_fraction (float): Share of pages a line must appear on to be dropped
+
+    Returns:
+        list: Cleaned page texts
+    """
+    if len(pages) < 2:
+        return [page for page in pages]
+
+    page_lines = [page.splitlines() for page in pages]
+    page_edges = [_edge_lines(lines) for lines in page_lines]
+    counts = Counter()
+    for lines, edges in zip(page_lines, page_edges):
+        counts.update({_line_signature(lines[index]) for index in edges})
+    banded = sum(1 for edges in page_edges if edges)
+    threshold = max(2, int(banded * min_fraction + 0.5))
+    repeated = {signature for signature, count in counts.items() if count >= threshold}
+
+    cleaned = []
+    for lines, edges in zip(page_lines, page_edges):
+        kept = []
+        for index, line in enumerate(lines):
+            stripped = line.strip()
+            if index in edges and (_line_signature(stripped) in repeated or PAGE_NUMBER_RE.match(stripped)):
+                continue
+            kept.append(line)
+        cleaned.append("\n".join(kept))
+    return cleaned
+
+
+def split_sentences(text):
+    """Split text into sentences, joining hard-wrapped PDF lines first."""
+    sentences = []
+    for paragraph in text.split("\n\n"):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        for sentence in SENTENCE_END_RE.split(paragraph):
+            words = sentence.split()
+            # Text without punctuation (tables, bullet dumps) is cut into bounded pieces
+            for start in range(0, len(words), MAX_SENTENCE_WORDS):
+                sentences.append(" ".join(words[start:start + MAX_SENTENCE_WORDS]))
+    return sentences
+
+
+def _tfidf_rows(sentences):
+    """
+    Hashed TF-IDF vectors in sparse (CSR) form, one L2-normalised row per sentence.
+
+    Returns:
+        tuple: (rows, buckets, values) arrays with one entry per distinct
+            bucket of each sentence
+    """
+    rows = []
+    buckets = []
+    values = []
+    for row, sentence in enumerate(sentences):
+        counts = Counter(zlib.crc32(w.encode()) % HASH_BUCKETS for w in WORD_RE.findall(sentence.lower()) if w not in STOPWORDS)
+        rows.extend([row] * len(counts))
+        buckets.extend(counts.keys())
+        values.extend(counts.values())
+    rows = np.array(rows, dtype=np.int64)
+    buckets = np.array(buckets, dtype=np.int64)
+    values = np.array(values, dtype=np.float32)
+
+    document_frequency = np.bincount(buckets, minlength=HASH_BUCKETS)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    values *= idf.astype(np.float32)[buckets]
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(sentences))).astype(np.float32)
+    norms[norms == 0] = 1
+    values /= norms[rows]
+    return rows, buckets, values
+
+
+def _cosine_similarity(rows, buckets, values, count):
+    """Dense sentence-by-sentence similarity from sparse rows, summed bucket by bucket."""
+    similarity = np.zeros((count, count), dtype=np.float32)
+    order = np.argsort(buckets, kind="stable")
+    boundaries = np.flatnonzero(np.diff(buckets[order])) + 1
+    for members, weights in zip(np.split(rows[order], boundaries), np.split(values[order], boundaries)):
+        if len(members) > 1:
+            similarity[np.ix_(members, members)] += np.outer(weights, weights)
+    return similarity
+
+
+def rank_sentences(sentences, damping=0.85, iterations=30):
+    """
+    Score sentences by importance with TextRank over TF-IDF cosine similarity.
+
+    Sentence vectors are sparse. Very long inputs fall back to similarity
+    with the document centroid, so memory stays linear in the size of the
+    text; the quadratic similarity matrix is only built for at most
+    TEXTRANK_MAX_SENTENCES sentences.
+
+    Returns:
+        numpy.ndarray: One score per sentence, higher is more central
+    """
+    if not sentences:
+        return np.zeros(0, dtype=np.float32)
+    rows, buckets, values = _tfidf_rows(sentences)
+
+    if len(sentences) > TEXTRANK_MAX_SENTENCES:
+        centroid = np.bincount(buckets, weights=values, minlength=HASH_BUCKETS) / len(sentences)
+        return np.bincount(rows, weights=values * centroid[buckets], minlength=len(sentences)).astype(np.float32)
+
+    similarity = _cosine_similarity(rows, buckets, values, len(sentences))
+    np.fill_diagonal(similarity, 0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    row_sums[row_sums == 0] = 1
+    transition = similarity / row_sums
+    scores = np.full(len(sentences), 1 / len(sentences), dtype=np.float32)
+    for _ in range(iterations):
+        scores = (1 - damping) / len(sentences) + damping * (transition.T @ scores)
+    return scores
+
+
+def summarize_to_budget(text, token_budget):
+    """Keep the highest ranked sentences that fit the budget, in their original order."""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    sentences = split_sentences(text)
+    scores = rank_sentences(sentences)
+    chosen = []
+    used = 0
+    for index in np.argsort(-scores, kind="stable"):
+        cost = estimate_tokens(sentences[index])
+        if used + cost > token_budget:
+            continue
+        chosen.append(index)
+        used += cost
+    return "\n".join(sentences[i] for i in sorted(chosen))
+
+
+def allocate_budget(sizes, token_budget):
+    """
+    Split a token budget across sources proportionally to their size.
+
+    Every source gets at least an equal share of half the budget so small
+    files are not drowned out, and budget a source cannot use is handed on
+    to the others.
+    """
+    if not sizes:
+        return []
+    floor = token_budget / (2 * len(sizes))
+    allocation = [min(size, floor) for size in sizes]
+    remaining = token_budget - sum(allocation)
+    while remaining > 1:
+        open_sources = [i for i, size in enumerate(sizes) if allocation[i] < size]
+        if not open_sources:
+            break
+        total = sum(sizes[i] for i in open_sources)
+        handed_out = 0
+        for i in open_sources:
+            extra = min(sizes[i] - allocation[i], remaining * sizes[i] / total)
+            allocation[i] += extra
+            handed_out += extra
+        remaining -= handed_out
+        if handed_out < 1:
+            break
+    return [int(value) for value in allocation]
+
+
+def compress_topic(text, token_budget=None):
+    """
+    Compress combined source text to fit a token budget before prompting.
+
+    Text produced by parse_topic_from_files for several files is split on
+    its [SECTION i OF n] markers and the budget is shared across sections,
+    so every source stays represented in the prompt.
+
+    Args:
+        text (str): Combined source text
+        token_budget (int): Maximum tokens to keep, defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        str: Compressed text
+    """
+    token_budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    text = normalize_whitespace(text)
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    markers = list(SECTION_RE.finditer(text))
+    if not markers:
+        return summarize_to_budget(text, token_budget)
+
+    preamble = text[:markers[0].start()].strip()
+    sections = []
+    for position, marker in enumerate(markers):
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(text)
+        body = text[marker.end():end].strip("\n")
+        header_match = SOURCE_HEADER_RE.match(body + "\n")
+        header = header_match.group(0).strip("\n") if header_match else ""
+        if header_match:
+            body = body[header_match.end():]
+        sections.append((marker.group(0), header, body.strip()))
+
+    overhead = estimate_tokens(preamble) + sum(estimate_tokens(marker + header) for marker, header, _ in sections)
+    budgets = allocate_budget(
+        [estimate_tokens(body) for _, _, body in sections],
+        max(token_budget - overhead, len(sections))
+    )
+
+    parts = [preamble] if preamble else []
+    for (marker, header, body), budget in zip(sections, budgets):
+        compressed = summarize_to_budget(body, budget)
+        parts.append("\n".join(piece for piece in (marker, header, compressed) if piece))
+    return "\n\n".join(parts)
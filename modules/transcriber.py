@@ -0,0 +1,230 @@
+import copy
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit as st
+from pydub import AudioSegment
+
+from modules.shared_state import get_shared_state
+
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base")
+# Chunks transcribed in parallel; each worker gets its own model object sharing one set of weights
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+# Upper bound for one chunk; Whisper decodes audio in 30 second windows
+TRANSCRIBE_CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", "30"))
+
+SAMPLE_RATE = 16000
+VAD_FRAME_SECONDS = 0.03
+# Frames this far above the quietest 10% of the clip (and below the loudest) count as speech
+VAD_MARGIN_DB = 10.0
+VAD_MIN_THRESHOLD_DB = -50.0
+# Pauses shorter than this do not split speech
+MIN_SILENCE_SECONDS = 0.4
+SPEECH_PAD_SECONDS = 0.2
+TRANSCRIPT_CACHE_SIZE = 256
+TRANSCRIPT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def decode_audio(audio_bytes, fmt="webm"):
+    """Decode recorder bytes to mono 16 kHz float32 samples in [-1, 1]."""
+    try:
+        segment = AudioSegment.from_file(io.BytesIO(audio_bytes), format=fmt)
+    except Exception:
+        # Fall back to Whisper's own ffmpeg loader for formats pydub cannot read
+        import whisper
+        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{fmt}") as temp_in:
+            temp_in.write(audio_bytes)
+            input_path = temp_in.name
+        try:
+            return whisper.load_audio(input_path, sr=SAMPLE_RATE)
+        finally:
+            os.unlink(input_path)
+    segment = segment.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+    return np.array(segment.get_array_of_samples(), dtype=np.float32) / 32768.0
+
+
+def speech_segments(samples):
+    """
+    Energy-based voice activity detection.
+
+    Returns:
+        list: (start, end) sample ranges containing speech, padded slightly
+            and with short pauses merged
+    """
+    frame = int(SAMPLE_RATE * VAD_FRAME_SECONDS)
+    count = len(samples) // frame
+    if count == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    frames = samples[:count * frame].reshape(count, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    floor, peak = np.percentile(energy_db, [10, 95])
+    # Clips with hardly any pauses have no real noise floor; stay below the loud frames then
+    threshold = max(min(floor + VAD_MARGIN_DB, peak - VAD_MARGIN_DB), VAD_MIN_THRESHOLD_DB)
+    speech = np.concatenate(([False], energy_db > threshold, [False]))
+    edges = np.flatnonzero(np.diff(speech.astype(np.int8)))
+    runs = list(zip(edges[::2], edges[1::2]))
+
+    min_gap = int(MIN_SILENCE_SECONDS / VAD_FRAME_SECONDS)
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    pad = int(SPEECH_PAD_SECONDS * SAMPLE_RATE)
+    return [(max(0, start * frame - pad), min(len(samples), end * frame + pad)) for start, end in merged]
+
+
+def chunk_segments(segments, max_samples):
+    """Pack speech segments into chunks of at most max_samples, cutting only at pauses where possible."""
+    chunks = []
+    for start, end in segments:
+        if chunks and end - chunks[-1][0] <= max_samples:
+            chunks[-1] = (chunks[-1][0], end)
+            continue
+        # A single run of speech longer than a chunk is split at fixed points
+        while end - start > max_samples:
+            chunks.append((start, start + max_samples))
+            start += max_samples
+        chunks.append((start, end))
+    return chunks
+
+
+def _load_whisper_model(name):
+    import whisper
+    return whisper.load_model(name)
+
+
+def _clone_sharing_weights(model):
+    """A separate module tree over the same parameter tensors, so decoding hooks do not collide."""
+    memo = {id(tensor): tensor for tensor in list(model.parameters()) + list(model.buffers())}
+    return copy.deepcopy(model, memo)
+
+
+class ChunkedTranscriber:
+    """
+    Transcribe recordings in parallel, speech chunk by speech chunk.
+
+    The clip is split at pauses found by voice activity detection, chunks
+    are transcribed on a thread pool (PyTorch releases the GIL, so workers
+    run on separate cores) and the text is joined back in order. Finished
+    transcripts are cached by a hash of the audio bytes, in process and in
+    the shared state backend when one is configured.
+    """
+
+    def __init__(self, model_name=WHISPER_MODEL, workers=TRANSCRIBE_WORKERS, chunk_seconds=TRANSCRIBE_CHUNK_SECONDS, model_loader=None):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.max_chunk_samples = int(chunk_seconds * SAMPLE_RATE)
+        self._model_loader = model_loader or _load_whisper_model
+        self._models = None
+        self._model_lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whisper")
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _worker_model(self):
+        model = getattr(self._local, "model", None)
+        if model is None:
+            with self._model_lock:
+                if self._models is None:
+                    # Clone before any decoding runs, so no hooks are copied along
+                    base = self._model_loader(self.model_name)
+                    self._models = [base] + [_clone_sharing_weights(base) for _ in range(self.workers - 1)]
+                    self._limit_torch_threads()
+                model = self._models.pop()
+            self._local.model = model
+        return model
+
+    def _limit_torch_threads(self):
+        # Keep parallel chunks from oversubscribing the cores with intra-op threads
+        if self.workers > 1:
+            try:
+                import torch
+                torch.set_num_threads(max(1, (os.cpu_count() or 1) // self.workers))
+            except ImportError:
+                pass
+
+    def _transcribe_chunk(self, samples):
+        result = self._worker_model().transcribe(samples, language="en", fp16=False)
+        return result["text"].strip()
+
+    def cache_key(self, audio_bytes):
+        return hashlib.sha256(self.model_name.encode("utf-8") + b"\0" + audio_bytes).hexdigest()
+
+    def cached(self, audio_bytes):
+        """The cached transcript for these bytes, or None."""
+        key = self.cache_key(audio_bytes)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        shared_state = get_shared_state()
+        if shared_state is not None:
+            try:
+                text = shared_state.get(f"transcript:{key}")
+            except Exception as e:
+                print(f"⚠️ Could not read transcript from shared state: {e}")
+                text = None
+            if text is not None:
+                text = text.decode("utf-8")
+                self._remember(key, text)
+                return text
+        return None
+
+    def _remember(self, key, text):
+        with self._cache_lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > TRANSCRIPT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def chunks(self, samples):
+        segments = speech_segments(samples)
+        # Nothing detected as speech: transcribe the whole clip rather than return nothing
+        spans = chunk_segments(segments, self.max_chunk_samples) if segments else [(0, len(samples))]
+        return [samples[start:end] for start, end in spans]
+
+    def transcribe(self, audio_bytes, fmt="webm"):
+        """
+        Transcribe a recording, reusing the cached text for identical bytes.
+
+        Args:
+            audio_bytes (bytes): Raw recorder output
+            fmt (str): Container format reported by the recorder
+
+        Returns:
+            str: Transcript with chunk texts joined in order
+        """
+        text = self.cached(audio_bytes)
+        if text is not None:
+            return text
+
+        chunks = self.chunks(decode_audio(audio_bytes, fmt))
+        texts = list(self._executor.map(self._transcribe_chunk, chunks))
+        text = " ".join(part for part in texts if part)
+
+        key = self.cache_key(audio_bytes)
+        self._remember(key, text)
+        shared_state = get_shared_state()
+        if shared_state is not None:
+            try:
+                shared_state.set(f"transcript:{key}", text.encode("utf-8"), TRANSCRIPT_TTL_SECONDS)
+            except Exception as e:
+                print(f"⚠️ Could not save transcript to shared state: {e}")
+        return text
+
+
+@st.cache_resource
+def get_transcriber():
+    """Process-wide transcriber configured from the WHISPER_MODEL and TRANSCRIBE_* settings."""
+    return ChunkedTranscriber()
@@ -0,0 +1,185 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+from bson import json_util
+from pymongo import MongoClient
+
+from modules.quiz_storage import store_quiz_documents
+
+# Flush policy: write as soon as this many documents are queued, or after this many seconds
+QUIZ_FLUSH_BATCH_SIZE = int(os.environ.get("QUIZ_FLUSH_BATCH_SIZE", "50"))
+QUIZ_FLUSH_INTERVAL_SECONDS = float(os.environ.get("QUIZ_FLUSH_INTERVAL_SECONDS", "2"))
+# Append-only journal for documents that could not be written yet
+QUIZ_JOURNAL_PATH = os.path.abspath(os.environ.get("QUIZ_JOURNAL_PATH", "quiz_write_journal.jsonl"))
+# After a failed replay, wait this long before the flush timer tries the journal again
+JOURNAL_RETRY_SECONDS = 30
+
+
+class MongoQuizWriter:
+    """Bulk writer for the quizzes collection used by the write-behind buffer."""
+
+    def __init__(self, mongo_uri, server_selection_timeout_ms=5000):
+        self.client = MongoClient(mongo_uri, serverSelectionTimeoutMS=server_selection_timeout_ms)
+        self.db = self.client.get_database()
+
+    def __call__(self, docs):
+        store_quiz_documents(self.db, docs)
+
+
+def default_writer():
+    """Writer for the configured QUIZ_STORAGE_BACKEND."""
+    from modules.pg_backend import PostgresQuizWriter, use_postgres
+    if use_postgres():
+        return PostgresQuizWriter()
+    return MongoQuizWriter(os.environ.get("MONGO_URI"))
+
+
+class WriteBehindBuffer:
+    """
+    Queue documents off the request path and write them in bulk.
+
+    A background thread flushes when the batch size is reached or the flush
+    interval elapses. If the writer fails, the batch is appended to a JSONL
+    journal, which is replayed after the next successful write and retried
+    on the flush timer. Journal lines that cannot be parsed are moved to a
+    .bad file next to it.
+    """
+
+    def __init__(self, writer, journal_path, batch_size=QUIZ_FLUSH_BATCH_SIZE, flush_interval=QUIZ_FLUSH_INTERVAL_SECONDS):
+        self.writer = writer
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._queue_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._next_replay = 0.0
+
+    def submit(self, doc):
+        with self._queue_lock:
+            self._queue.append(doc)
+            full = len(self._queue) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quiz-write-behind", daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def pending_count(self):
+        with self._queue_lock:
+            return len(self._queue)
+
+    def _run(self):
+        # The first pass also picks up anything journaled by a previous process
+        while True:
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the thread alive; queued records stay queued for the next pass
+                print(f"⚠️ Quiz write-behind flush failed, retrying: {e}")
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+    def _take_batch(self):
+        with self._queue_lock:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            return batch
+
+    def flush(self):
+        """Write everything queued so far; failed batches go to the journal."""
+        with self._flush_lock:
+            wrote = False
+            failed = False
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                try:
+                    self.writer(batch)
+                    wrote = True
+                except Exception as e:
+                    failed = True
+                    print(f"⚠️ Could not save {len(batch)} quiz record(s), journaling for replay: {e}")
+                    try:
+                        self._append_journal(batch)
+                    except OSError as journal_error:
+                        print(f"⚠️ Could not journal quiz records, keeping them queued: {journal_error}")
+                        self._requeue(batch)
+                        break
+            if wrote or (not failed and time.monotonic() >= self._next_replay):
+                self._replay_journal_locked()
+
+    def _requeue(self, batch):
+        with self._queue_lock:
+            self._queue.extendleft(reversed(batch))
+
+    def replay_journal(self):
+        with self._flush_lock:
+            self._replay_journal_locked()
+
+    def _append_journal(self, docs):
+        with open(self.journal_path, "a", encoding="utf-8") as journal:
+            for doc in docs:
+                journal.write(json_util.dumps(doc) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def _read_journal(self, path):
+        """Parse a journal line by line, moving lines that cannot be parsed to the .bad file."""
+        docs = []
+        bad_lines = []
+        with open(path, encoding="utf-8", errors="replace") as journal:
+            for line in journal:
+                if not line.strip():
+                    continue
+                try:
+                    docs.append(json_util.loads(line))
+                except Exception:
+                    bad_lines.append(line if line.endswith("\n") else line + "\n")
+        if bad_lines:
+            with open(f"{self.journal_path}.bad", "a", encoding="utf-8") as bad:
+                bad.writelines(bad_lines)
+            print(f"⚠️ Moved {len(bad_lines)} unreadable journal line(s) to {self.journal_path}.bad")
+        return docs
+
+    def _replay_journal_locked(self):
+        replay_path = f"{self.journal_path}.replay"
+        if not os.path.exists(self.journal_path) and not os.path.exists(replay_path):
+            return
+        # Move the journal aside first so new failures append to a fresh file
+        if not os.path.exists(replay_path):
+            os.replace(self.journal_path, replay_path)
+        docs = self._read_journal(replay_path)
+        try:
+            for start in range(0, len(docs), self.batch_size):
+                self.writer(docs[start:start + self.batch_size])
+        except Exception as e:
+            print(f"⚠️ Journal replay failed, will retry later: {e}")
+            self._next_replay = time.monotonic() + JOURNAL_RETRY_SECONDS
+            self._append_journal(docs)
+        else:
+            if docs:
+                print(f"✅ Replayed {len(docs)} journaled quiz record(s)")
+        os.remove(replay_path)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_buffer(writer_factory=None):
+    """Process-wide write-behind buffer for quiz documents."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            writer = (writer_factory or default_writer)()
+            _buffer = WriteBehindBuffer(writer, QUIZ_JOURNAL_PATH)
+            atexit.register(_buffer.flush)
+        return _buffer
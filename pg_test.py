@@ -1,22 +1,14 @@
-import os
-import psycopg2
+import sys
 from dotenv import load_dotenv
 load_dotenv()
+from modules.pg_backend import export_quizzes
+
+
 def main():
-    connection = psycopg2.connect(
-        host=os.environ["PGHOST"],
-        dbname=os.environ["PGDATABASE"],
-        user=os.environ["PGUSER"],
-        password=os.environ["PGPASSWORD"],
-        sslmode=os.environ.get("PGSSLMODE", "require")
-    )
-    cursor = connection.cursor()
-    cursor.execute('SELECT * FROM quiz_results')
-    rows = cursor.fetchall()
-    for row in rows:
-        print(row)
-    cursor.close()
-    connection.close()
+    """Stream quiz_results to stdout as CSV (default) or JSONL: python pg_test.py [csv|jsonl]"""
+    fmt = sys.argv[1] if len(sys.argv) > 1 else "csv"
+    export_quizzes(sys.stdout.buffer, fmt)
+    sys.stdout.buffer.flush()
 
 if __name__ == '__main__':
     main()